@@ -1,12 +1,16 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# Bundle the exported model (and its external weights file, if any) for local inference
+onnx_datas = [(f, '.') for f in ('deepfake_detector.onnx', 'deepfake_detector.onnx.data') if os.path.exists(f)]
 
 
 a = Analysis(
     ['deepfake_monitor.py'],
     pathex=[],
     binaries=[],
-    datas=[('lion_icon.png', '.'), ('lion_icon.ico', '.')],
-    hiddenimports=[],
+    datas=[('lion_icon.png', '.'), ('lion_icon.ico', '.')] + onnx_datas,
+    hiddenimports=['onnxruntime'] if onnx_datas else [],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,7 +1,10 @@
+import os
+import tempfile
 import torch
 import gradio as gr
 import numpy as np
 import librosa
+import soundfile as sf
 import torch.nn as nn
 
 # Copy your exact CNN model class
@@ -80,13 +83,63 @@ class AudioFeatureExtractor:
         except Exception as e:
             print(f"Error processing {audio_path}: {e}")
             return None
+    
+    def iter_windows(self, y, hop_seconds=1.0, batch_size=64, duration=5.0, hop_length=512, n_fft=2048):
+        """Windows every hop_seconds over a whole waveform, batch_size at a time
+        
+        Same windows as detector_core.AudioFeatureExtractor.iter_windows: the
+        mel power is computed per batch for the frames it covers, and each
+        window gets the dB reference extract_mel_spectrogram would use for a
+        clip starting there. Yields (windows tensor, start times in seconds).
+        """
+        n_frames = 1 + len(y) // hop_length
+        hop_frames = max(1, int(round(hop_seconds * self.sample_rate / hop_length)))
+        starts = list(range(0, max(n_frames - self.max_len, 0) + 1, hop_frames))
+        if starts[-1] + self.max_len < n_frames:
+            starts.append(n_frames - self.max_len)  # Always score the tail
+        
+        ref_frames = 1 + int(duration * self.sample_rate) // hop_length
+        span = max(self.max_len, ref_frames)
+        
+        for i in range(0, len(starts), batch_size):
+            batch = starts[i:i + batch_size]
+            first, last = batch[0], min(batch[-1] + span, n_frames)
+            
+            # Centred-STFT frames [first, last) without transforming the rest of the file
+            start = first * hop_length - n_fft // 2
+            stop = (last - 1) * hop_length + n_fft // 2
+            segment = np.pad(y[max(start, 0):min(stop, len(y))], (max(-start, 0), max(stop - len(y), 0)))
+            mel_spec = librosa.feature.melspectrogram(
+                y=segment, sr=self.sample_rate, n_mels=self.n_mels, hop_length=hop_length, center=False
+            )
+            log_mel = 10.0 * np.log10(np.maximum(1e-10, mel_spec))
+            frame_max = log_mel.max(axis=0)
+            
+            windows = np.zeros((len(batch), self.n_mels, self.max_len), dtype=np.float32)
+            for j, frame in enumerate(batch):
+                offset = frame - first
+                window = log_mel[:, offset:offset + self.max_len] - frame_max[offset:offset + ref_frames].max()
+                windows[j, :, :window.shape[1]] = np.maximum(window, -80.0)
+            
+            yield torch.from_numpy(windows).unsqueeze(1), np.array(batch) * hop_length / self.sample_rate
 
 # Load model (you'll upload your .pth file)
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-model = DeepfakeDetectorCNN()
-model.load_state_dict(torch.load('best_deepfake_detector.pth', map_location=device))
+if os.path.exists('deepfake_detector_int8.pt'):
+    # int8 TorchScript model from quantize_model.py - smaller and faster on CPU-only Spaces
+    device = torch.device('cpu')
+    model = torch.jit.load('deepfake_detector_int8.pt', map_location=device)
+elif os.path.exists('deepfake_detector_frozen.pt'):
+    # BatchNorm-folded, dropout-free graph from convert_to_onnx.py
+    model = torch.jit.load('deepfake_detector_frozen.pt', map_location=device)
+else:
+    model = DeepfakeDetectorCNN()
+    model.load_state_dict(torch.load('best_deepfake_detector.pth', map_location=device))
+    model.to(device).eval()
+    # torch.jit.freeze folds BatchNorm into the convs and drops the eval-time Dropout
+    with torch.no_grad():
+        model = torch.jit.freeze(torch.jit.trace(model, torch.zeros(1, 1, 128, 128, device=device)))
 model.eval()
-model.to(device)
 
 feature_extractor = AudioFeatureExtractor()
 
@@ -96,6 +149,10 @@ def predict_audio_file(audio_file):
         if audio_file is None:
             return {"error": "Please upload an audio file"}
         
+        # Recordings longer than the 5s model input are scored end to end
+        if librosa.get_duration(path=audio_file) > 5.0:
+            return predict_long_form(audio_file)
+        
         features = feature_extractor.extract_mel_spectrogram(audio_file)
         
         if features is None:
@@ -128,6 +185,42 @@ def predict_audio_file(audio_file):
     except Exception as e:
         return {"error": str(e)}
 
+def predict_long_form(audio_file, hop_seconds=1.0):
+    """Same response as predict_audio_file, averaged over 3s windows every hop_seconds
+    
+    Adds 'duration' and a per-window 'segments' timeline. is_suspicious is
+    set when any single segment looks fake, so a short spliced-in clip is
+    not averaged away.
+    """
+    y, _ = librosa.load(audio_file, sr=feature_extractor.sample_rate)
+    duration = len(y) / feature_extractor.sample_rate
+    window_seconds = feature_extractor.max_len * 512 / feature_extractor.sample_rate
+    
+    segments = []
+    with torch.no_grad():
+        for windows, starts in feature_extractor.iter_windows(y, hop_seconds):
+            fake_probs = torch.softmax(model(windows.to(device)), dim=1)[:, 1].cpu().tolist()
+            segments.extend({"start": float(start), "end": float(min(start + window_seconds, duration)),
+                             "fake_probability": p} for start, p in zip(starts, fake_probs))
+    
+    fake_prob = float(np.mean([segment["fake_probability"] for segment in segments]))
+    max_fake_prob = max(segment["fake_probability"] for segment in segments)
+    return {
+        "prediction": "FAKE" if fake_prob > 0.5 else "REAL",
+        "confidence": max(fake_prob, 1.0 - fake_prob),
+        "probabilities": {
+            "real": 1.0 - fake_prob,
+            "fake": fake_prob
+        },
+        "is_suspicious": max_fake_prob > 0.7,
+        "duration": duration,
+        "segments": segments,
+        "details": {
+            "model_version": "1.0",
+            "processing_success": True
+        }
+    }
+
 def format_result_for_ui(result):
     """Format result for Gradio UI"""
     if "error" in result:
@@ -145,7 +238,38 @@ def format_result_for_ui(result):
     **Verdict**: {'🚨 LIKELY AI GENERATED' if result['prediction'] == 'FAKE' else '✅ LIKELY REAL VOICE'}
     
     **Confidence**: {result['confidence']:.1%}
-    """
+    """ + format_segments(result.get("segments"))
+
+def format_segments(segments):
+    """Timeline table for long-form results"""
+    if not segments:
+        return ""
+    
+    rows = '\n'.join(
+        f"| {segment['start']:.1f}s - {segment['end']:.1f}s | "
+        f"{'🔴' if segment['fake_probability'] > 0.5 else '🟢'} {segment['fake_probability']:.1%} |"
+        for segment in segments)
+    return f"""
+
+| Segment | AI Generated |
+|---|---|
+{rows}
+"""
+
+def warmup(sample_rates=(44100, 48000)):
+    """Run dummy uploads through decode -> mel -> CNN so the first real request is not the slow one"""
+    rng = np.random.default_rng(0)
+    for sr in sample_rates:
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            path = f.name
+        try:
+            sf.write(path, (rng.standard_normal(sr * 5) * 0.01).astype(np.float32), sr)
+            predict_audio_file(path)
+        finally:
+            os.remove(path)
+
+# Warm up before the interface exists, so the Space only reports ready afterwards
+warmup()
 
 # Create Gradio interface
 interface = gr.Interface(
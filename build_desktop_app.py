@@ -37,6 +37,19 @@ def check_requirements():
     
     return True
 
+def find_onnx_model_files():
+    """Exported model to bundle for local inference (convert_to_onnx.py output), or []
+    
+    Newer torch exporters write the weights to a .data file next to the graph,
+    so that is bundled too when present.
+    """
+    for path in ['deepfake_detector.onnx',
+                 os.path.join('..', 'onnx_models', 'deepfake_detector.onnx'),
+                 os.path.join('onnx_models', 'deepfake_detector.onnx')]:
+        if os.path.exists(path):
+            return [f for f in (path, path + '.data') if os.path.exists(f)]
+    return []
+
 def create_icon_files():
     """Create icon files in different formats for each platform"""
     try:
@@ -124,6 +137,26 @@ def get_pyinstaller_command(script_name=None):
     for import_module in hidden_imports:
         base_command.extend(['--hidden-import', import_module])
     
+    # Local ONNX inference: bundle the model next to the executable (found via
+    # sys._MEIPASS by onnx_backend.find_onnx_model) together with onnxruntime
+    model_files = find_onnx_model_files()
+    try:
+        import onnxruntime
+        has_onnxruntime = True
+    except ImportError:
+        has_onnxruntime = False
+    
+    if model_files and has_onnxruntime:
+        for model_file in model_files:
+            base_command.extend(['--add-data', f'{model_file}{os.pathsep}.'])
+        base_command.extend(['--hidden-import', 'onnxruntime'])
+        print(f"✅ Bundling local model: {', '.join(model_files)}")
+    elif model_files:
+        print("⚠️ onnxruntime not installed - building without the local model (remote API only)")
+    else:
+        print("⚠️ deepfake_detector.onnx not found - building without the local model (remote API only)")
+        print("💡 Run convert_to_onnx.py first to enable local inference in the executable")
+    
     # Platform-specific settings
     if system == 'Windows':
         base_command.extend([
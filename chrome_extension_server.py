@@ -4,52 +4,529 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import torch
-import librosa
-import soundfile as sf
 import numpy as np
-import tempfile
 import os
 import base64
 import io
+import soundfile as sf
 from datetime import datetime
 import json
 import threading
 import time
+import queue
+import math
+import hashlib
+import itertools
+from collections import OrderedDict, deque
+import sys
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path  # <-- ADD THIS LINE
+import soxr
+
+# WebSocket streaming (/api/stream) is optional: pip install flask-sock
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+# Import your model (core module only - no training/UI dependencies)
+from detection_store import DetectionStore
+from server_metrics import ServerMetrics, process_rss_bytes, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from detector_core import (AudioFeatureExtractor, StreamingMelSpectrogram, FeatureProcessPool,
+                           FEATURE_VERSION, load_detector_model, warmup_model)
+
+# Raw PCM sample formats accepted by /api/detect (little-endian, interleaved)
+PCM_FORMATS = {
+    'float32': np.dtype('<f4'),
+    'int16': np.dtype('<i2')
+}
+
+# Bounds for client-declared PCM layouts (X-Sample-Rate / X-Channels, stream start messages)
+MAX_SAMPLE_RATE = 384000
+MAX_CHANNELS = 32
+
+def check_pcm_layout(sample_rate, channels):
+    """Raise ValueError unless the sample rate and channel count are usable"""
+    if not 0 < sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f'Sample rate must be between 1 and {MAX_SAMPLE_RATE} Hz')
+    if not 1 <= channels <= MAX_CHANNELS:
+        raise ValueError(f'Channel count must be between 1 and {MAX_CHANNELS}')
 
-# Import your model
-from deepfake_detector import DeepfakeDetectorCNN, AudioFeatureExtractor
+def decode_pcm(buffer, sample_format='float32', channels=1):
+    """Decode an interleaved PCM byte buffer into a float32 (frames,) or (frames, channels) array"""
+    dtype = PCM_FORMATS[sample_format]
+    if len(buffer) % (dtype.itemsize * channels):
+        raise ValueError(f'Body length {len(buffer)} is not a whole number of {sample_format} frames')
+    
+    # float32 bodies are used in place - no copy until resampling
+    samples = np.frombuffer(buffer, dtype=dtype)
+    if sample_format == 'int16':
+        samples = samples.astype(np.float32) / 32768.0
+    
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return samples
+
+def parse_pcm_upload(headers, body, default_rate):
+    """Decode a raw PCM /api/detect body; returns (samples, sample_rate, url, source)
+    
+    Raises ValueError for bad headers or a malformed body.
+    """
+    try:
+        sample_rate = int(headers.get('X-Sample-Rate', default_rate))
+        channels = int(headers.get('X-Channels', 1))
+    except ValueError:
+        raise ValueError('Invalid X-Sample-Rate or X-Channels header')
+    check_pcm_layout(sample_rate, channels)
+    
+    sample_format = headers.get('X-Sample-Format', 'float32').lower()
+    if sample_format not in PCM_FORMATS:
+        raise ValueError(f'Unsupported X-Sample-Format: {sample_format}')
+    
+    if not body:
+        raise ValueError('No audio data provided')
+    
+    samples = decode_pcm(body, sample_format, channels)
+    url = headers.get('X-Page-Url', 'Unknown')
+    source = headers.get('X-Audio-Source', 'Web Audio')
+    return samples, sample_rate, url, source
+
+class StaleChunkError(Exception):
+    """Raised for audio whose result would arrive after its deadline"""
+
+def chunk_deadline(headers, stale_after):
+    """Monotonic deadline for an upload stamped with X-Capture-Time (ms since the epoch)
+    
+    None when the client sent no (or an unreadable or non-finite) capture time.
+    """
+    try:
+        captured = float(headers.get('X-Capture-Time'))
+    except (TypeError, ValueError):
+        return None
+    
+    # A NaN deadline is neither expired nor live and would never be answered
+    if not math.isfinite(captured):
+        return None
+    
+    age = time.time() - captured / 1000.0
+    return time.monotonic() + stale_after - age
+
+class AdmissionGate:
+    """Non-blocking cap on concurrent /api/detect requests
+    
+    Requests that do not get in are answered straight away with 429, before
+    their body is read, so bursts cost neither queueing delay nor memory.
+    """
+    
+    def __init__(self, max_in_flight=32):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+    
+    def try_enter(self):
+        with self.lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+    
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+class StreamingSession:
+    """Per-connection state for /api/stream
+    
+    Binary PCM messages are resampled with a stateful soxr stream (no edge
+    effects between messages) and appended to a rolling mel window, so each
+    message only costs the STFT frames it completes. push() reports when a
+    full window is buffered and detect_interval seconds of new audio have
+    arrived since the last detection.
+    
+    With timestamped=True every message starts with its capture time as a
+    little-endian float64 (ms since the epoch). Messages older than
+    stale_after seconds are dropped and the window restarts, so a session
+    that falls behind skips ahead instead of analysing old audio.
+    """
+    
+    def __init__(self, feature_extractor, sample_rate, sample_format='float32', channels=1,
+                 detect_interval=1.0, timestamped=False, stale_after=2.0, on_drop=None):
+        if sample_format not in PCM_FORMATS:
+            raise ValueError(f'Unsupported sample_format: {sample_format}')
+        
+        self.sample_format = sample_format
+        self.channels = channels
+        self.timestamped = timestamped
+        self.stale_after = stale_after
+        self.deadline = None
+        self.dropped = 0
+        self.on_drop = on_drop
+        
+        target_rate = feature_extractor.sample_rate
+        self.resampler = None
+        if sample_rate != target_rate:
+            self.resampler = soxr.ResampleStream(sample_rate, target_rate, 1, dtype='float32')
+        
+        self.mel = StreamingMelSpectrogram(feature_extractor)
+        self.detect_frames = max(1, int(detect_interval * target_rate / feature_extractor.hop_length))
+        self.frames_since_detection = 0
+    
+    def push(self, payload):
+        """Append one binary PCM message; returns True when a detection is due"""
+        if self.timestamped:
+            if len(payload) < 8:
+                raise ValueError('Timestamped frame is shorter than its header')
+            
+            captured = float(np.frombuffer(payload, dtype='<f8', count=1)[0])
+            if not math.isfinite(captured):
+                raise ValueError('Frame capture time must be a finite number')
+            self.deadline = time.monotonic() + self.stale_after - (time.time() - captured / 1000.0)
+            payload = memoryview(payload)[8:]
+            
+            if time.monotonic() > self.deadline:
+                self.drop()
+                return False
+        
+        samples = decode_pcm(payload, self.sample_format, self.channels)
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        
+        if self.resampler is not None:
+            samples = self.resampler.resample_chunk(samples)
+        
+        self.frames_since_detection += self.mel.push(samples)
+        
+        if self.mel.is_full and self.frames_since_detection >= self.detect_frames:
+            self.frames_since_detection = 0
+            return True
+        return False
+    
+    def features(self):
+        return self.mel.log_mel()
+    
+    def drop(self):
+        """Discard a stale message; the window restarts so it never spans the gap"""
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop()
+        self.mel.reset()
+        self.frames_since_detection = 0
+        if self.resampler is not None:
+            self.resampler.clear()
+
+# /api/history query parameters answered from the SQLite store
+HISTORY_FILTERS = ('start', 'end', 'url', 'source', 'prediction')
+MAX_HISTORY_LIMIT = 5000
+
+class DetectionHistory:
+    """Fixed-size detection log with O(1) append and eviction
+    
+    Every detection gets a monotonically increasing 'id' that clients use as
+    a cursor: since(cursor) returns only what was added after it. Ids are
+    never reused, not even after clear().
+    """
+    
+    def __init__(self, maxlen=1000, start_id=0):
+        self.entries = deque(maxlen=maxlen)
+        self.last_id = start_id
+        self.lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def append(self, detection):
+        with self.lock:
+            self.last_id += 1
+            detection['id'] = self.last_id
+            self.entries.append(detection)  # The oldest entry drops off when full
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def latest(self, n):
+        """The last n detections, oldest first"""
+        with self.lock:
+            return list(itertools.islice(reversed(self.entries), n))[::-1]
+    
+    def since(self, cursor, limit):
+        """Up to `limit` detections added after id `cursor` (oldest first)
+        
+        Returns (detections, truncated); truncated is True when entries after
+        the cursor were already evicted.
+        """
+        with self.lock:
+            newer = min(self.last_id - cursor, len(self.entries))
+            truncated = self.last_id - cursor > len(self.entries) and cursor > 0
+            detections = list(itertools.islice(reversed(self.entries), max(newer, 0)))[::-1]
+        return detections[:limit], truncated
+
+class ResultCache:
+    """LRU cache of [real_prob, fake_prob] by upload content hash, with a TTL
+    
+    Replays and tabs playing the same stream send identical buffers; a hit
+    skips feature extraction and inference entirely.
+    """
+    
+    def __init__(self, maxsize=4096, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key, probabilities):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), probabilities)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+class BatchInferenceWorker:
+    """Background thread that runs pending feature tensors through the model in batches
+    
+    Request threads submit() a (n_mels, frames) feature array and wait on the
+    returned Future. The worker takes the first pending request, keeps
+    collecting for up to max_wait_ms or until max_batch_size, then runs one
+    batched forward pass and resolves every Future with [real_prob, fake_prob].
+    """
+    
+    def __init__(self, model, device, max_batch_size=16, max_wait_ms=5.0, metrics=None):
+        self.model = model
+        self.device = device
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def submit(self, features, deadline=None):
+        """Queue one feature array; the Future resolves to [real_prob, fake_prob]
+        
+        If the forward pass cannot start before `deadline` (time.monotonic()),
+        the Future fails with StaleChunkError instead.
+        """
+        future = Future()
+        self.pending.put((features, future, deadline))
+        return future
+    
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+    
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch or wait limit"""
+        first = self.pending.get()
+        if first is None:
+            return None
+        
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.pending.put(None)  # Finish this batch, stop on the next one
+                break
+            batch.append(item)
+        
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            
+            # Skip work nobody is waiting for any more; one flag per item so
+            # every future is either failed here or run below
+            now = time.monotonic()
+            live = []
+            for item in batch:
+                deadline = item[2]
+                expired = deadline is not None and not now <= deadline
+                if expired:
+                    item[1].set_exception(StaleChunkError('Chunk expired before inference'))
+                else:
+                    live.append(item)
+            batch = live
+            if not batch:
+                continue
+            
+            futures = [future for _, future, _ in batch]
+            try:
+                features = np.stack([np.asarray(f, dtype=np.float32) for f, _, _ in batch])
+                features_tensor = torch.from_numpy(features).unsqueeze(1).to(self.device)
+                
+                start = time.perf_counter()
+                with torch.no_grad():
+                    probabilities = torch.softmax(self.model(features_tensor), dim=1).cpu().numpy()
+                
+                if self.metrics is not None:
+                    self.metrics.stage_seconds.observe(time.perf_counter() - start, 'forward')
+                    self.metrics.batch_size.observe(len(batch))
+                
+                for future, probs in zip(futures, probabilities):
+                    future.set_result(probs)
+            
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
 
 class ChromeExtensionServer:
     """Backend server for Chrome extension deepfake detection"""
     
-    def __init__(self):
+    def __init__(self, max_batch_size=16, max_wait_ms=5.0, stream_interval=1.0, cpu_workers=None,
+                 feature_processes=0, db_path='data/detections.db', result_cache_size=4096,
+                 result_cache_ttl=300.0, max_in_flight=32, stale_after=2.0, warmup=True,
+                 model_path='models/best_deepfake_detector.pth'):
         self.app = Flask(__name__)
         CORS(self.app)  # Enable CORS for Chrome extension
+        self.sock = Sock(self.app) if Sock is not None else None
         
         # Load model
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = None
+        self.model_version = None
         self.feature_extractor = None
-        self.load_model()
+        self.load_model(model_path)
+        
+        # Identical uploads (replays, several tabs on one stream) reuse earlier results
+        self.result_cache = ResultCache(result_cache_size, result_cache_ttl)
+        
+        # Backpressure: at most max_in_flight detections at once, and audio
+        # older than stale_after seconds is dropped rather than analysed late
+        self.admission = AdmissionGate(max_in_flight)
+        self.stale_after = stale_after
+        self.dropped_stale = 0
+        
+        # Stage latencies and batch sizes for /metrics
+        self.metrics = ServerMetrics()
+        
+        # Concurrent requests share batched forward passes
+        self.batcher = BatchInferenceWorker(self.model, self.device, max_batch_size, max_wait_ms,
+                                            self.metrics)
         
-        # Detection history
-        self.detections = []
+        # feature_processes > 0 moves decoding and mel computation to worker
+        # processes, so extraction scales with cores instead of sharing the GIL
+        self.feature_pool = None
+        if feature_processes:
+            self.feature_pool = FeatureProcessPool(self.feature_extractor, feature_processes)
+            print(f"⚙️ Feature extraction on {self.feature_pool.processes} worker processes")
+        
+        # Feature extraction for the ASGI mode runs here, off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers or os.cpu_count(),
+                                           thread_name_prefix='features')
+        
+        # Detection history: recent entries in memory, everything in SQLite
+        # (db_path=None keeps history in memory only)
+        self.store = DetectionStore(db_path) if db_path else None
+        start_id = self.store.last_id() if self.store is not None else 0
+        self.detections = DetectionHistory(maxlen=1000, start_id=start_id)
+        
+        # Open /api/stream sessions
+        self.stream_interval = stream_interval
+        self.active_streams = 0
+        self.stream_lock = threading.Lock()
         
         # Setup routes
         self.setup_routes()
+        
+        # Detection is refused (503) until warmup has run; /api/status reports 'ready'
+        self.max_batch_size = max_batch_size
+        self.ready_event = threading.Event()
+        self.warmup_seconds = None
+        if warmup:
+            threading.Thread(target=self.warmup, daemon=True).start()
+        else:
+            self.ready_event.set()
+    
+    def warmup(self):
+        """Run dummy audio through decode -> mel -> CNN at the expected batch sizes, then mark ready
+        
+        The first real requests would otherwise pay for librosa/numba JIT,
+        soxr setup, allocator growth and oneDNN primitive creation.
+        """
+        start = time.perf_counter()
+        rng = np.random.default_rng(0)
+        
+        try:
+            self.feature_extractor.warmup()
+            if self.feature_pool is not None:
+                self.feature_pool.warmup()
+            
+            # Encoded uploads and raw PCM at the rates browsers capture at
+            for sample_rate in (44100, 48000):
+                noise = (rng.standard_normal(sample_rate * 5) * 0.01).astype(np.float32)
+                wav = io.BytesIO()
+                sf.write(wav, noise, sample_rate, format='WAV')
+                self.extract_encoded(wav.getvalue())
+                self.extract_pcm(noise, sample_rate)
+                StreamingSession(self.feature_extractor, sample_rate).push(noise.tobytes())
+            
+            # oneDNN builds primitives per input shape: cover every size the batcher can produce
+            warmup_model(self.model, self.device, range(1, self.max_batch_size + 1))
+        
+        except Exception as e:
+            print(f"⚠️ Warmup failed, serving cold: {e}")
+        
+        self.warmup_seconds = time.perf_counter() - start
+        self.ready_event.set()
+        print(f"🔥 Warmup finished in {self.warmup_seconds:.1f}s - ready for detections")
+    
+    @property
+    def ready(self):
+        return self.ready_event.is_set()
     
-    def load_model(self):
-        """Load the trained deepfake detection model"""
+    def warming_up_info(self):
+        return {'error': 'Server is warming up', 'ready': False}
+    
+    def load_model(self, model_path='models/best_deepfake_detector.pth'):
+        """Load the trained deepfake detection model (float .pth or int8 .pt)"""
         try:
-            model_path = 'models/best_deepfake_detector.pth'
             if not os.path.exists(model_path):
                 raise FileNotFoundError("Model not found! Please train the model first.")
             
-            self.model = DeepfakeDetectorCNN()
-            self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-            self.model.eval()
-            self.model.to(self.device)
+            self.model, self.device = load_detector_model(model_path, self.device)
+            self.model_version = self.file_version(model_path)
             
             self.feature_extractor = AudioFeatureExtractor()
             print("✅ Model loaded for Chrome extension!")
@@ -58,13 +535,56 @@ class ChromeExtensionServer:
             print(f"❌ Error loading model: {e}")
             raise
     
+    @staticmethod
+    def file_version(path):
+        """Short content hash of the model weights, so cached results follow model updates"""
+        digest = hashlib.blake2b(digest_size=8)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def result_key(self, *parts):
+        """Cache key: model and feature version, then the upload's metadata and payload"""
+        digest = hashlib.blake2b(f'{self.model_version}:{FEATURE_VERSION}'.encode(), digest_size=16)
+        for part in parts:
+            digest.update(b'|')
+            digest.update(part if isinstance(part, (bytes, bytearray, memoryview, np.ndarray))
+                          else str(part).encode())
+        return digest.digest()
+    
+    def pcm_key(self, samples, sample_rate):
+        return self.result_key('pcm', sample_rate, samples.shape, np.ascontiguousarray(samples))
+    
+    def encoded_key(self, audio_bytes):
+        return self.result_key('encoded', audio_bytes)
+    
     def setup_routes(self):
         """Setup Flask routes for the Chrome extension"""
         
         @self.app.route('/api/detect', methods=['POST'])
         def detect_deepfake():
-            """Main detection endpoint"""
+            """Main detection endpoint
+            
+            Accepts raw PCM (Content-Type: application/octet-stream, with
+            X-Sample-Rate / X-Sample-Format / X-Channels headers) or the
+            original JSON body with base64-encoded audio_data.
+            """
+            if not self.ready:
+                return jsonify(self.warming_up_info()), 503, {'Retry-After': '1'}
+            
+            if not self.admission.try_enter():
+                return jsonify(self.busy_info()), 429, {'Retry-After': str(self.retry_after())}
+            
+            start = time.perf_counter()
             try:
+                deadline = chunk_deadline(request.headers, self.stale_after)
+                if deadline is not None and time.monotonic() > deadline:
+                    return jsonify(self.drop_stale())
+                
+                if request.mimetype == 'application/octet-stream':
+                    return self.detect_binary(deadline)
+                
                 data = request.get_json()
                 
                 if 'audio_data' not in data:
@@ -79,94 +599,538 @@ class ChromeExtensionServer:
                 source = data.get('source', 'Web Audio')
                 
                 # Process audio
-                result = self.process_audio_chunk(audio_bytes, url, source)
+                result = self.process_audio_chunk(audio_bytes, url, source, deadline)
                 
                 return jsonify(result)
                 
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
+            
+            finally:
+                self.admission.leave()
+                self.metrics.stage_seconds.observe(time.perf_counter() - start, 'total')
+        
+        if self.sock is not None:
+            @self.sock.route('/api/stream')
+            def stream_detection(ws):
+                """Streaming endpoint: one WebSocket per tab
+                
+                The client sends a JSON start message ({"type": "start",
+                "sample_rate", "sample_format", "channels", "url", "source"}),
+                then binary PCM frames. Detections are pushed back as JSON once
+                a full analysis window is buffered.
+                """
+                self.handle_stream(ws)
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def get_metrics():
+            """Prometheus scrape endpoint"""
+            return self.app.response_class(self.metrics_text(), content_type=METRICS_CONTENT_TYPE)
         
         @self.app.route('/api/status', methods=['GET'])
         def get_status():
             """Get server status"""
-            return jsonify({
-                'status': 'running',
-                'model_loaded': self.model is not None,
-                'device': str(self.device),
-                'total_detections': len(self.detections)
-            })
+            return jsonify(self.status_info(streaming=self.sock is not None))
         
         @self.app.route('/api/history', methods=['GET'])
         def get_history():
-            """Get detection history"""
-            return jsonify({
-                'detections': self.detections[-50:],  # Last 50 detections
-                'total': len(self.detections)
-            })
+            """Get detection history (?since=<id>&limit=<n> for incremental polling)"""
+            try:
+                return jsonify(self.history_info(request.args))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         @self.app.route('/api/clear_history', methods=['POST'])
         def clear_history():
             """Clear detection history"""
-            self.detections.clear()
+            self.clear_detections()
             return jsonify({'message': 'History cleared'})
     
-    def process_audio_chunk(self, audio_bytes, url, source):
-        """Process audio chunk and detect deepfakes"""
+    def status_info(self, streaming):
+        """Payload for /api/status"""
+        return {
+            'status': 'running',
+            'ready': self.ready,
+            'warmup_seconds': self.warmup_seconds,
+            'model_loaded': self.model is not None,
+            'device': str(self.device),
+            'total_detections': len(self.detections),
+            'streaming': streaming,
+            'persistent': self.store is not None,
+            'model_version': self.model_version,
+            'in_flight': self.admission.in_flight,
+            'max_in_flight': self.admission.max_in_flight,
+            'result_cache': self.result_cache.stats(),
+            'active_streams': self.active_streams
+        }
+    
+    def metrics_text(self):
+        """/metrics payload: stage histograms plus values read at scrape time"""
+        cache = self.result_cache.stats()
+        gauges = {
+            'deepfake_ready': ('1 once startup warmup has finished', int(self.ready)),
+            'deepfake_inference_queue_depth': ('Feature arrays waiting for a forward pass',
+                                               self.batcher.pending.qsize()),
+            'deepfake_result_cache_hit_rate': ('Result cache hits / lookups', cache['hit_rate']),
+            'deepfake_result_cache_entries': ('Results held in the cache', cache['size']),
+            'deepfake_active_streams': ('Open /api/stream connections', self.active_streams),
+            'deepfake_requests_in_flight': ('Admitted /api/detect requests in progress',
+                                            self.admission.in_flight),
+            'deepfake_history_entries': ('Detections in the in-memory history', len(self.detections)),
+            'process_resident_memory_bytes': ('Resident memory of the server process', process_rss_bytes())
+        }
+        counters = {
+            'deepfake_result_cache_hits_total': ('Result cache hits', cache['hits']),
+            'deepfake_result_cache_misses_total': ('Result cache misses', cache['misses']),
+            'deepfake_detections_total': ('Detections recorded since start', self.detections.last_id),
+            'deepfake_rejected_total': ('Requests answered 429 by admission control', self.admission.rejected),
+            'deepfake_dropped_stale_total': ('Chunks dropped for missing their deadline', self.dropped_stale)
+        }
+        return self.metrics.render(gauges, counters)
+    
+    def retry_after(self):
+        """Retry-After hint in whole seconds: roughly one average request latency"""
+        return max(1, math.ceil(self.metrics.stage_seconds.mean('total')))
+    
+    def busy_info(self):
+        return {'error': 'Server busy', 'retry_after': self.retry_after()}
+    
+    def count_stale(self):
+        self.dropped_stale += 1
+    
+    def drop_stale(self):
+        """Response for audio that is too old to be worth analysing"""
+        self.count_stale()
+        return {'dropped': True, 'reason': 'stale'}
+    
+    def history_info(self, params):
+        """Payload for /api/history
+        
+        Without `since` this is the last 50 detections. With it, only
+        detections newer than that id are returned; clients pass the
+        returned 'cursor' back on the next poll. start/end (ISO timestamps),
+        url, source and prediction filter the persistent store instead of
+        the in-memory ring.
+        """
         try:
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_file.write(audio_bytes)
-                temp_path = temp_file.name
-            
-            # Extract features
-            features = self.feature_extractor.extract_mel_spectrogram(temp_path)
-            
-            if features is None:
-                os.unlink(temp_path)
-                return {'error': 'Failed to extract features'}
-            
-            # Predict
-            features_tensor = torch.FloatTensor(features).unsqueeze(0).unsqueeze(0)
-            features_tensor = features_tensor.to(self.device)
-            
-            with torch.no_grad():
-                outputs = self.model(features_tensor)
-                probabilities = torch.softmax(outputs, dim=1)
-                fake_prob = probabilities[0][1].item()
-                real_prob = probabilities[0][0].item()
-            
-            # Clean up
-            os.unlink(temp_path)
-            
-            # Create result
-            result = {
-                'timestamp': datetime.now().isoformat(),
-                'url': url,
-                'source': source,
-                'fake_probability': fake_prob,
-                'real_probability': real_prob,
-                'prediction': 'FAKE' if fake_prob > 0.5 else 'REAL',
-                'confidence': max(fake_prob, real_prob),
-                'is_suspicious': fake_prob > 0.7
-            }
+            limit = int(params.get('limit', 50))
+            since = int(params['since']) if params.get('since') is not None else None
+        except ValueError:
+            raise ValueError('since and limit must be positive integers')
+        
+        # Checked once for both paths: SQLite treats a negative LIMIT as no
+        # limit at all, and the in-memory ring cannot slice by one
+        if limit < 1 or (since is not None and since < 0):
+            raise ValueError('since and limit must be positive integers')
+        limit = min(limit, MAX_HISTORY_LIMIT)
+        
+        filters = {key: params.get(key) for key in HISTORY_FILTERS if params.get(key) is not None}
+        truncated = False
+        
+        if filters:
+            if self.store is None:
+                raise ValueError('Filtered history queries need the detection store (db_path)')
+            detections = self.store.query(after_id=since, limit=limit, **filters)
+        elif since is None:
+            detections = self.detections.latest(limit)
+            
+            # After a restart the ring starts empty; older rows come from disk,
+            # and anything still queued for the writer from the ring
+            if len(detections) < limit and self.store is not None:
+                merged = {d['id']: d for d in self.store.query(limit=limit)}
+                merged.update((d['id'], d) for d in detections)
+                detections = [merged[i] for i in sorted(merged)[-limit:]]
+        else:
+            detections, truncated = self.detections.since(since, limit)
             
-            # Store detection
-            self.detections.append(result)
+            # Fall back to disk for cursors that have left the ring
+            if truncated and self.store is not None:
+                detections, truncated = self.store.query(after_id=since, limit=limit), False
+        
+        if detections:
+            cursor = detections[-1]['id']
+        elif filters:
+            cursor = since or 0  # Matches still waiting to be written may come later
+        else:
+            cursor = self.detections.last_id
+        
+        return {
+            'detections': detections,
+            'total': len(self.detections),
+            'cursor': cursor,
+            'truncated': truncated
+        }
+    
+    def clear_detections(self):
+        self.detections.clear()
+        if self.store is not None:
+            self.store.clear()
+    
+    def open_stream_session(self, config):
+        """Build a StreamingSession from a start message; returns (session, url, source)"""
+        if not isinstance(config, dict) or config.get('type') != 'start':
+            raise ValueError('Expected a start message')
+        if not self.ready:
+            raise ValueError('Server is warming up')
+        
+        sample_rate = int(config.get('sample_rate', self.feature_extractor.sample_rate))
+        channels = int(config.get('channels', 1))
+        check_pcm_layout(sample_rate, channels)
+        
+        session = StreamingSession(
+            self.feature_extractor,
+            sample_rate,
+            config.get('sample_format', 'float32'),
+            channels,
+            self.stream_interval,
+            bool(config.get('timestamped', False)),
+            self.stale_after,
+            on_drop=self.count_stale
+        )
+        return session, config.get('url', 'Unknown'), config.get('source', 'Web Audio')
+    
+    def handle_stream(self, ws):
+        """Serve one /api/stream connection until the client stops or disconnects"""
+        try:
+            session, url, source = self.open_stream_session(json.loads(ws.receive()))
+        except (TypeError, ValueError) as e:
+            ws.send(json.dumps({'error': str(e)}))
+            return
+        
+        ws.send(json.dumps({'type': 'ready'}))
+        
+        with self.stream_lock:
+            self.active_streams += 1
+        
+        try:
+            while True:
+                message = ws.receive()
+                
+                if isinstance(message, str):
+                    if json.loads(message).get('type') == 'stop':
+                        break
+                    continue
+                
+                try:
+                    detection_due = session.push(message)
+                except ValueError as e:
+                    ws.send(json.dumps({'error': str(e)}))
+                    continue
+                
+                if detection_due:
+                    result = self.classify_features(session.features(), url, source,
+                                                    deadline=session.deadline)
+                    if not result.get('dropped'):
+                        ws.send(json.dumps(result))
+        
+        finally:
+            with self.stream_lock:
+                self.active_streams -= 1
+    
+    def detect_binary(self, deadline=None):
+        """Handle a raw PCM upload; metadata comes from the request headers"""
+        # Read the body straight into one buffer (no form parsing, no base64)
+        body = request.get_data(cache=False)
+        
+        start = time.perf_counter()
+        try:
+            samples, sample_rate, url, source = parse_pcm_upload(
+                request.headers, body, self.feature_extractor.sample_rate)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        self.metrics.stage_seconds.observe(time.perf_counter() - start, 'decode')
+        
+        return jsonify(self.process_pcm_chunk(samples, sample_rate, url, source, deadline))
+    
+    def process_audio_chunk(self, audio_bytes, url, source, deadline=None):
+        """Process an encoded audio file (WAV, FLAC, ...) and detect deepfakes"""
+        try:
+            key = self.encoded_key(audio_bytes)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return self.record_detection(cached, url, source)
             
-            # Keep only last 1000 detections
-            if len(self.detections) > 1000:
-                self.detections = self.detections[-1000:]
+            # Extract features directly from the uploaded bytes
+            timings = {}
+            features = self.extract_encoded(audio_bytes, timings)
+            self.metrics.observe_stages(timings)
+            return self.classify_features(features, url, source, key, deadline)
             
-            return result
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def process_pcm_chunk(self, samples, sample_rate, url, source, deadline=None):
+        """Process raw PCM samples and detect deepfakes"""
+        try:
+            key = self.pcm_key(samples, sample_rate)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return self.record_detection(cached, url, source)
             
+            timings = {}
+            features = self.extract_pcm(samples, sample_rate, timings)
+            self.metrics.observe_stages(timings)
+            return self.classify_features(features, url, source, key, deadline)
+        
         except Exception as e:
             return {'error': str(e)}
     
-    def run(self, host='localhost', port=8765):
-        """Run the Flask server"""
+    def extract_pcm(self, samples, sample_rate, timings=None):
+        """Features for raw samples - on the process pool if there is one"""
+        if self.feature_pool is not None:
+            features, stage_timings = self.feature_pool.submit_array(samples, sample_rate).result()
+            if timings is not None:
+                timings.update(stage_timings)
+            return features
+        return self.feature_extractor.extract_from_array(samples, sample_rate, timings)
+    
+    def extract_encoded(self, audio_bytes, timings=None):
+        """Features for an encoded audio file - on the process pool if there is one"""
+        if self.feature_pool is not None:
+            features, stage_timings = self.feature_pool.submit_bytes(audio_bytes).result()
+            if timings is not None:
+                timings.update(stage_timings)
+            return features
+        return self.feature_extractor.extract_from_bytes(audio_bytes, timings)
+    
+    def classify_features(self, features, url, source, cache_key=None, deadline=None):
+        """Run one feature array through the model and record the detection"""
+        if features is None:
+            return {'error': 'Failed to extract features'}
+        
+        if deadline is not None and time.monotonic() > deadline:
+            return self.drop_stale()
+        
+        # Predict (batched with any other in-flight requests)
+        try:
+            probabilities = self.batcher.submit(features, deadline).result()
+        except StaleChunkError:
+            return self.drop_stale()
+        if cache_key is not None:
+            self.result_cache.put(cache_key, probabilities)
+        return self.record_detection(probabilities, url, source)
+    
+    async def classify_features_async(self, features, url, source, cache_key=None, deadline=None):
+        """classify_features for the event loop - awaits the batcher without holding a thread"""
+        if features is None:
+            return {'error': 'Failed to extract features'}
+        
+        if deadline is not None and time.monotonic() > deadline:
+            return self.drop_stale()
+        
+        try:
+            probabilities = await asyncio.wrap_future(self.batcher.submit(features, deadline))
+        except StaleChunkError:
+            return self.drop_stale()
+        if cache_key is not None:
+            self.result_cache.put(cache_key, probabilities)
+        return self.record_detection(probabilities, url, source)
+    
+    def record_detection(self, probabilities, url, source):
+        """Turn [real_prob, fake_prob] into a result dict and add it to the history"""
+        real_prob, fake_prob = (float(p) for p in probabilities)
+        
+        # Create result
+        result = {
+            'timestamp': datetime.now().isoformat(),
+            'url': url,
+            'source': source,
+            'fake_probability': fake_prob,
+            'real_probability': real_prob,
+            'prediction': 'FAKE' if fake_prob > 0.5 else 'REAL',
+            'confidence': max(fake_prob, real_prob),
+            'is_suspicious': fake_prob > 0.7
+        }
+        
+        # Store detection (the oldest of the last 1000 drops off; the store keeps everything)
+        self.detections.append(result)
+        if self.store is not None:
+            self.store.add(result)
+        
+        return result
+    
+    def create_asgi_app(self):
+        """Starlette app with the same routes as the Flask app, for serving under uvicorn
+        
+        Handlers are coroutines: feature extraction goes to the process pool
+        when there is one and to the bounded self.executor otherwise, inference is awaited on the shared batcher, so
+        idle and streaming connections cost no thread while they wait.
+        """
+        from starlette.applications import Starlette
+        from starlette.middleware import Middleware
+        from starlette.middleware.cors import CORSMiddleware
+        from starlette.responses import JSONResponse, PlainTextResponse
+        from starlette.routing import Route, WebSocketRoute
+        
+        extractor = self.feature_extractor
+        
+        async def run_cpu(func, *args):
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        
+        async def extract_pcm(samples, sample_rate):
+            timings = {}
+            if self.feature_pool is not None:
+                future = self.feature_pool.submit_array(samples, sample_rate)
+                features, timings = await asyncio.wrap_future(future)
+            else:
+                features = await run_cpu(extractor.extract_from_array, samples, sample_rate, timings)
+            self.metrics.observe_stages(timings)
+            return features
+        
+        async def extract_encoded(audio_bytes):
+            timings = {}
+            if self.feature_pool is not None:
+                future = self.feature_pool.submit_bytes(audio_bytes)
+                features, timings = await asyncio.wrap_future(future)
+            else:
+                features = await run_cpu(extractor.extract_from_bytes, audio_bytes, timings)
+            self.metrics.observe_stages(timings)
+            return features
+        
+        async def detect_deepfake(request):
+            if not self.ready:
+                return JSONResponse(self.warming_up_info(), status_code=503, headers={'Retry-After': '1'})
+            
+            if not self.admission.try_enter():
+                return JSONResponse(self.busy_info(), status_code=429,
+                                    headers={'Retry-After': str(self.retry_after())})
+            
+            start = time.perf_counter()
+            try:
+                deadline = chunk_deadline(request.headers, self.stale_after)
+                if deadline is not None and time.monotonic() > deadline:
+                    return JSONResponse(self.drop_stale())
+                
+                if request.headers.get('content-type', '').split(';')[0].strip() == 'application/octet-stream':
+                    body = await request.body()
+                    decode_start = time.perf_counter()
+                    try:
+                        samples, sample_rate, url, source = parse_pcm_upload(
+                            request.headers, body, extractor.sample_rate)
+                    except ValueError as e:
+                        return JSONResponse({'error': str(e)}, status_code=400)
+                    self.metrics.stage_seconds.observe(time.perf_counter() - decode_start, 'decode')
+                    
+                    key = self.pcm_key(samples, sample_rate)
+                    cached = self.result_cache.get(key)
+                    if cached is None:
+                        features = await extract_pcm(samples, sample_rate)
+                else:
+                    data = await request.json()
+                    
+                    if 'audio_data' not in data:
+                        return JSONResponse({'error': 'No audio data provided'}, status_code=400)
+                    
+                    audio_bytes = base64.b64decode(data['audio_data'])
+                    url = data.get('url', 'Unknown')
+                    source = data.get('source', 'Web Audio')
+                    key = self.encoded_key(audio_bytes)
+                    cached = self.result_cache.get(key)
+                    if cached is None:
+                        features = await extract_encoded(audio_bytes)
+                
+                if cached is not None:
+                    return JSONResponse(self.record_detection(cached, url, source))
+                return JSONResponse(await self.classify_features_async(features, url, source, key, deadline))
+            
+            except Exception as e:
+                return JSONResponse({'error': str(e)}, status_code=500)
+            
+            finally:
+                self.admission.leave()
+                self.metrics.stage_seconds.observe(time.perf_counter() - start, 'total')
+        
+        async def stream_detection(websocket):
+            await websocket.accept()
+            try:
+                session, url, source = self.open_stream_session(await websocket.receive_json())
+            except (TypeError, ValueError) as e:
+                await websocket.send_json({'error': str(e)})
+                await websocket.close()
+                return
+            
+            await websocket.send_json({'type': 'ready'})
+            
+            with self.stream_lock:
+                self.active_streams += 1
+            
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message['type'] == 'websocket.disconnect':
+                        break
+                    
+                    if message.get('text') is not None:
+                        if json.loads(message['text']).get('type') == 'stop':
+                            break
+                        continue
+                    
+                    # Frames of one session are processed in order, one at a time
+                    try:
+                        detection_due = await run_cpu(session.push, message['bytes'])
+                    except ValueError as e:
+                        await websocket.send_json({'error': str(e)})
+                        continue
+                    
+                    if detection_due:
+                        features = await run_cpu(session.features)
+                        result = await self.classify_features_async(features, url, source,
+                                                                    deadline=session.deadline)
+                        if not result.get('dropped'):
+                            await websocket.send_json(result)
+            
+            finally:
+                with self.stream_lock:
+                    self.active_streams -= 1
+        
+        async def get_metrics(request):
+            return PlainTextResponse(self.metrics_text(), media_type=METRICS_CONTENT_TYPE)
+        
+        async def get_status(request):
+            return JSONResponse(self.status_info(streaming=True))
+        
+        async def get_history(request):
+            try:
+                # Store queries are SQLite reads; keep them off the event loop
+                return JSONResponse(await run_cpu(self.history_info, request.query_params))
+            except ValueError as e:
+                return JSONResponse({'error': str(e)}, status_code=400)
+        
+        async def clear_history(request):
+            await run_cpu(self.clear_detections)  # Waits for the store's writer thread
+            return JSONResponse({'message': 'History cleared'})
+        
+        return Starlette(
+            routes=[
+                Route('/api/detect', detect_deepfake, methods=['POST']),
+                WebSocketRoute('/api/stream', stream_detection),
+                Route('/metrics', get_metrics, methods=['GET']),
+                Route('/api/status', get_status, methods=['GET']),
+                Route('/api/history', get_history, methods=['GET']),
+                Route('/api/clear_history', clear_history, methods=['POST'])
+            ],
+            middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'],
+                                   allow_headers=['*'])]
+        )
+    
+    def run(self, host='localhost', port=8765, mode='flask'):
+        """Run the server: mode='flask' (development server) or 'asgi' (uvicorn)"""
+        if mode == 'asgi':
+            import uvicorn
+            
+            print(f"🌐 Starting Chrome Extension server (ASGI) on http://{host}:{port}")
+            print("🔌 Chrome extension can now connect!")
+            print(f"📡 Streaming detection on ws://{host}:{port}/api/stream")
+            uvicorn.run(self.create_asgi_app(), host=host, port=port, log_level='warning')
+            return
+        
         print(f"🌐 Starting Chrome Extension server on http://{host}:{port}")
         print("🔌 Chrome extension can now connect!")
-        self.app.run(host=host, port=port, debug=False)
+        if self.sock is not None:
+            print(f"📡 Streaming detection on ws://{host}:{port}/api/stream")
+        else:
+            print("⚠️ flask-sock not installed - WebSocket streaming disabled, HTTP only")
+        self.app.run(host=host, port=port, debug=False, threaded=True)
 
 # Chrome Extension Files (save these as separate files)
 
@@ -261,6 +1225,8 @@ POPUP_HTML = '''
 POPUP_JS = '''
 let isMonitoring = false;
 let serverUrl = 'http://localhost:8765';
+let historyCursor = null;
+let recentDetections = [];
 
 document.addEventListener('DOMContentLoaded', async () => {
     await checkServerStatus();
@@ -279,7 +1245,11 @@ async function checkServerStatus() {
         const data = await response.json();
         
         const statusEl = document.getElementById('status');
-        if (data.status === 'running') {
+        if (data.status === 'running' && data.ready === false) {
+            statusEl.className = 'status inactive';
+            statusEl.textContent = '⏳ Server Warming Up';
+            setTimeout(checkServerStatus, 1000);
+        } else if (data.status === 'running') {
             statusEl.className = 'status active';
             statusEl.textContent = '✅ Server Connected';
         }
@@ -312,17 +1282,22 @@ async function toggleMonitoring() {
 
 async function loadDetections() {
     try {
-        const response = await fetch(`${serverUrl}/api/history`);
+        // Only fetch what is new since the last poll
+        const query = historyCursor === null ? '?limit=5' : `?since=${historyCursor}`;
+        const response = await fetch(`${serverUrl}/api/history${query}`);
         const data = await response.json();
         
+        historyCursor = data.cursor;
+        recentDetections = recentDetections.concat(data.detections).slice(-5);
+        
         const listEl = document.getElementById('detectionList');
         
-        if (data.detections.length === 0) {
+        if (recentDetections.length === 0) {
             listEl.innerHTML = 'No detections yet';
             return;
         }
         
-        listEl.innerHTML = data.detections.slice(-5).map(detection => {
+        listEl.innerHTML = recentDetections.map(detection => {
             const time = new Date(detection.timestamp).toLocaleTimeString();
             const confidence = (detection.confidence * 100).toFixed(1);
             const className = detection.prediction === 'FAKE' ? 'fake' : 'real';
@@ -341,6 +1316,7 @@ async function loadDetections() {
 async function clearHistory() {
     try {
         await fetch(`${serverUrl}/api/clear_history`, {method: 'POST'});
+        recentDetections = [];
         await loadDetections();
     } catch (error) {
         console.error('Failed to clear history:', error);
@@ -354,6 +1330,7 @@ let audioContext;
 let mediaStreamSource;
 let processor;
 let serverUrl = 'http://localhost:8765';
+let socket = null;
 
 // Listen for messages from popup
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
@@ -390,6 +1367,7 @@ async function startAudioMonitoring() {
         mediaStreamSource.connect(processor);
         processor.connect(audioContext.destination);
         
+        openStream();
         isMonitoring = true;
         console.log('🎤 Deepfake monitoring started');
         
@@ -401,6 +1379,14 @@ async function startAudioMonitoring() {
 function stopAudioMonitoring() {
     if (!isMonitoring) return;
     
+    if (socket) {
+        if (socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({type: 'stop'}));
+        }
+        socket.close();
+        socket = null;
+    }
+    
     if (processor) {
         processor.disconnect();
         processor = null;
@@ -420,23 +1406,57 @@ function stopAudioMonitoring() {
     console.log('⏹️ Deepfake monitoring stopped');
 }
 
+function openStream() {
+    // One persistent connection per tab; falls back to HTTP if it cannot open
+    socket = new WebSocket(serverUrl.replace(/^http/, 'ws') + '/api/stream');
+    socket.binaryType = 'arraybuffer';
+    
+    socket.onopen = () => {
+        socket.send(JSON.stringify({
+            type: 'start',
+            sample_rate: audioContext.sampleRate,
+            sample_format: 'float32',
+            timestamped: true,
+            url: window.location.href,
+            source: 'Web Audio'
+        }));
+    };
+    
+    socket.onmessage = (event) => {
+        const result = JSON.parse(event.data);
+        if (result.is_suspicious) {
+            showDeepfakeAlert(result);
+        }
+    };
+    
+    socket.onerror = () => {
+        console.warn('Streaming unavailable, using HTTP uploads');
+    };
+}
+
 async function analyzeAudioChunk(audioData) {
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        // Capture time first, so the server can drop frames it is too late for
+        const frame = new ArrayBuffer(8 + audioData.byteLength);
+        new DataView(frame).setFloat64(0, Date.now(), true);
+        new Float32Array(frame, 8).set(audioData);
+        socket.send(frame);
+        return;
+    }
+    
     try {
-        // Convert audio data to base64
-        const audioBlob = new Blob([audioData], { type: 'audio/wav' });
-        const audioBase64 = await blobToBase64(audioBlob);
-        
-        // Send to server for analysis
+        // Send the raw float32 samples - no WAV encoding or base64 round trip
         const response = await fetch(`${serverUrl}/api/detect`, {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json',
+                'Content-Type': 'application/octet-stream',
+                'X-Sample-Rate': String(audioContext.sampleRate),
+                'X-Sample-Format': 'float32',
+                'X-Capture-Time': String(Date.now()),
+                'X-Page-Url': window.location.href,
+                'X-Audio-Source': 'Web Audio'
             },
-            body: JSON.stringify({
-                audio_data: audioBase64,
-                url: window.location.href,
-                source: 'Web Audio'
-            })
+            body: audioData.buffer
         });
         
         const result = await response.json();
@@ -491,15 +1511,6 @@ function showDeepfakeAlert(result) {
     }
 }
 
-function blobToBase64(blob) {
-    return new Promise((resolve, reject) => {
-        const reader = new FileReader();
-        reader.onload = () => resolve(reader.result.split(',')[1]);
-        reader.onerror = reject;
-        reader.readAsDataURL(blob);
-    });
-}
-
 function createAudioWorkletProcessor() {
     return `
         class DeepfakeProcessor extends AudioWorkletProcessor {
@@ -595,8 +1606,15 @@ def main():
     create_extension_files()
     
     # Start server
-    server = ChromeExtensionServer()
-    server.run()
+    # --int8 serves the quantized model from quantize_model.py (CPU only)
+    model_path = ('models/deepfake_detector_int8.pt' if '--int8' in sys.argv
+                  else 'models/best_deepfake_detector.pth')
+    # --feature-processes N decodes uploads in N worker processes (~700 MB RSS each, off by default)
+    feature_processes = 0
+    if '--feature-processes' in sys.argv:
+        feature_processes = int(sys.argv[sys.argv.index('--feature-processes') + 1])
+    server = ChromeExtensionServer(feature_processes=feature_processes, model_path=model_path)
+    server.run(mode='asgi' if '--asgi' in sys.argv else 'flask')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,7 +3,8 @@
 import torch
 import torch.onnx
 import numpy as np
-from deepfake_detector import DeepfakeDetectorCNN, AudioFeatureExtractor
+from detector_core import (DeepfakeDetectorCNN, VariableLengthDetectorCNN, AudioFeatureExtractor,
+                           fuse_for_inference, freeze_for_inference)
 import json
 import os
 
@@ -29,6 +30,14 @@ def convert_pytorch_to_onnx():
     model.load_state_dict(torch.load(model_path, map_location=device))
     model.eval()
     
+    # Frozen TorchScript for the Python serving paths (load_detector_model / app.py)
+    frozen_path = 'models/deepfake_detector_frozen.pt'
+    torch.jit.save(freeze_for_inference(model, device), frozen_path)
+    print(f"✅ Frozen TorchScript model saved to {frozen_path}")
+    
+    # Export the inference graph: BatchNorm folded into the convs, no Dropout
+    model = fuse_for_inference(model)
+    
     # Create output directory in current folder (not public/)
     output_dir = "onnx_models"
     os.makedirs(output_dir, exist_ok=True)
@@ -113,6 +122,39 @@ def convert_pytorch_to_onnx():
     
     return onnx_path
 
+def convert_variable_length_to_onnx(model_path='models/best_deepfake_detector.pth'):
+    """Export VariableLengthDetectorCNN with dynamic batch and time axes
+    
+    Same weights as deepfake_detector.onnx; input is (batch, 1, 128, frames)
+    for any frames >= 16, so a whole recording is scored in one run.
+    """
+    print("\n🔄 Exporting variable-length model to ONNX...")
+    
+    device = torch.device('cpu')
+    model = VariableLengthDetectorCNN()
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model = fuse_for_inference(model)
+    
+    onnx_path = os.path.join("onnx_models", "deepfake_detector_varlen.onnx")
+    torch.onnx.export(
+        model,
+        torch.randn(1, 1, 128, 128),
+        onnx_path,
+        export_params=True,
+        opset_version=11,
+        do_constant_folding=True,
+        input_names=['audio_features'],
+        output_names=['predictions'],
+        dynamic_axes={
+            'audio_features': {0: 'batch_size', 3: 'frames'},
+            'predictions': {0: 'batch_size'}
+        },
+        verbose=False
+    )
+    
+    print(f"✅ Variable-length model exported to {onnx_path}")
+    return onnx_path
+
 def test_onnx_model():
     """Test the exported ONNX model"""
     
@@ -165,6 +207,9 @@ if __name__ == "__main__":
         # Test the conversion
         test_onnx_model()
         
+        # Whole-recording variant with a dynamic time axis
+        convert_variable_length_to_onnx()
+        
         print(f"\n🎯 Next steps:")
         print(f"1. Copy onnx_models/ folder contents to your frontend:")
         print(f"   cp onnx_models/* /path/to/lion-project/public/models/")
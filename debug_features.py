@@ -1,7 +1,7 @@
 # debug_features.py - Run this in your ML project to compare features
 
 import numpy as np
-from deepfake_detector import AudioFeatureExtractor
+from detector_core import AudioFeatureExtractor
 
 def debug_feature_extraction(audio_path):
     """Extract features and print statistics for comparison"""
@@ -17,20 +17,13 @@ pip install wandb
 
 # STEP 2: Project Structure Setup
 import os
+import hashlib
+import json
 import numpy as np
-import pandas as pd
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
-import librosa
-import soundfile as sf
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-import matplotlib.pyplot as plt
-import seaborn as sns
-import gradio as gr
-import pyaudio
 import threading
 import queue
 import time
@@ -38,6 +31,11 @@ from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+# Model and features come from the lightweight core module (re-exported here).
+# gradio, pyaudio and sklearn are imported inside the functions that need them.
+from detector_core import (AudioFeatureExtractor, DeepfakeDetectorCNN, load_detector_model, score_long_form,
+                           warmup_model)
+
 # Create project structure
 def setup_project_structure():
     """Create all necessary directories"""
@@ -179,69 +177,69 @@ def record_real_audio():
     audio.terminate()
     print("🎉 All recordings complete!")
 
-# STEP 5: Feature Extraction
-class AudioFeatureExtractor:
-    """Extract features from audio files"""
-    
-    def __init__(self, sample_rate=22050, n_mels=128, max_len=128):
-        self.sample_rate = sample_rate
-        self.n_mels = n_mels
-        self.max_len = max_len
+# STEP 5: Feature Extraction (AudioFeatureExtractor lives in detector_core.py)
+
+# STEP 6: Dataset Class
+class FeatureCache:
+    """Persistent mel-spectrogram cache keyed by file content and extractor parameters"""
     
-    def extract_mel_spectrogram(self, audio_path):
-        """Extract mel-spectrogram features"""
+    def __init__(self, feature_extractor, cache_dir='data/processed/features'):
+        self.feature_extractor = feature_extractor
+        # One directory per parameter set, so changing the extractor starts a fresh cache
+        self.cache_dir = Path(cache_dir) / feature_extractor.cache_key()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._digests = {}
+    
+    def file_digest(self, audio_path):
+        """Content hash of an audio file, memoized on (path, size, mtime)"""
+        stat = os.stat(audio_path)
+        memo_key = (str(audio_path), stat.st_size, stat.st_mtime_ns)
+        
+        if memo_key not in self._digests:
+            digest = hashlib.blake2b(digest_size=16)
+            with open(audio_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            self._digests[memo_key] = digest.hexdigest()
+        
+        return self._digests[memo_key]
+    
+    def _entry_path(self, audio_path):
+        return self.cache_dir / f"{self.file_digest(audio_path)}.npy"
+    
+    def lookup(self, audio_path):
+        """Memory-mapped cached features, or None on a miss"""
         try:
-            # Load audio
-            y, sr = librosa.load(audio_path, sr=self.sample_rate, duration=5.0)
-            
-            # Extract mel-spectrogram
-            mel_spec = librosa.feature.melspectrogram(
-                y=y, sr=sr, n_mels=self.n_mels, hop_length=512
-            )
-            
-            # Convert to log scale
-            mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-            
-            # Pad or truncate to fixed length
-            if mel_spec_db.shape[1] < self.max_len:
-                mel_spec_db = np.pad(mel_spec_db, 
-                                   ((0, 0), (0, self.max_len - mel_spec_db.shape[1])), 
-                                   mode='constant')
-            else:
-                mel_spec_db = mel_spec_db[:, :self.max_len]
-            
-            return mel_spec_db
-            
-        except Exception as e:
-            print(f"Error processing {audio_path}: {e}")
+            return np.load(self._entry_path(audio_path), mmap_mode='r')
+        except (FileNotFoundError, ValueError):
             return None
     
-    def extract_mfcc_features(self, audio_path):
-        """Extract MFCC features as backup"""
-        try:
-            y, sr = librosa.load(audio_path, sr=self.sample_rate, duration=5.0)
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            
-            # Pad or truncate
-            if mfccs.shape[1] < self.max_len:
-                mfccs = np.pad(mfccs, 
-                             ((0, 0), (0, self.max_len - mfccs.shape[1])), 
-                             mode='constant')
-            else:
-                mfccs = mfccs[:, :self.max_len]
-                
-            return mfccs
-        except:
-            return None
+    def store(self, audio_path, features):
+        """Write features atomically so concurrent loader workers never see partial files"""
+        entry_path = self._entry_path(audio_path)
+        tmp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.asarray(features, dtype=np.float32))
+        os.replace(tmp_path, entry_path)
+    
+    def get(self, audio_path):
+        """Cached features for a file, extracting and storing them on a miss"""
+        features = self.lookup(audio_path)
+        
+        if features is None:
+            features = self.feature_extractor.extract_mel_spectrogram(audio_path)
+            if features is not None:
+                self.store(audio_path, features)
+        
+        return features
 
-# STEP 6: Dataset Class
 class AudioDataset(Dataset):
     """PyTorch dataset for audio deepfake detection"""
     
-    def __init__(self, audio_paths, labels, feature_extractor):
+    def __init__(self, audio_paths, labels, feature_extractor, cache=None):
         self.audio_paths = audio_paths
         self.labels = labels
         self.feature_extractor = feature_extractor
+        self.cache = cache
         
     def __len__(self):
         return len(self.audio_paths)
@@ -251,73 +249,172 @@ class AudioDataset(Dataset):
         label = self.labels[idx]
         
         # Extract features
-        features = self.feature_extractor.extract_mel_spectrogram(audio_path)
+        if self.cache is not None:
+            features = self.cache.get(audio_path)
+        else:
+            features = self.feature_extractor.extract_mel_spectrogram(audio_path)
         
         if features is None:
             # Return zero tensor if extraction fails
             features = np.zeros((128, 128))
         
         # Convert to tensor
-        features = torch.FloatTensor(features).unsqueeze(0)  # Add channel dimension
+        features = torch.FloatTensor(np.asarray(features)).unsqueeze(0)  # Add channel dimension
         label = torch.LongTensor([label])
         
         return features, label.squeeze()
+    
+    def __getitems__(self, indices):
+        """Batched fetch used by DataLoader: one vectorized extraction per batch"""
+        features = {}
+        
+        if self.cache is not None:
+            for idx in indices:
+                cached = self.cache.lookup(self.audio_paths[idx])
+                if cached is not None:
+                    features[idx] = torch.from_numpy(np.array(cached)).unsqueeze(0)
+        
+        # Extract everything the cache could not serve in one batch
+        missing = [idx for idx in indices if idx not in features]
+        waveforms = [self.feature_extractor.load_waveform(self.audio_paths[idx]) for idx in missing]
+        loaded = [idx for idx, y in zip(missing, waveforms) if y is not None]
+        batch = self.feature_extractor.extract_batch([y for y in waveforms if y is not None])
+        
+        for idx, batch_features in zip(loaded, batch):
+            features[idx] = batch_features
+            if self.cache is not None:
+                self.cache.store(self.audio_paths[idx], batch_features[0].numpy())
+        
+        samples = []
+        for idx in indices:
+            # Zero features if extraction failed, same as __getitem__
+            sample_features = features.get(idx, torch.zeros((1, 128, 128)))
+            samples.append((sample_features, torch.tensor(self.labels[idx], dtype=torch.long)))
+        
+        return samples
 
-# STEP 7: CNN Model Architecture (FIXED WITH HIGHER DROPOUT)
-class DeepfakeDetectorCNN(nn.Module):
-    """CNN model for audio deepfake detection with anti-overtraining measures"""
-    
-    def __init__(self, num_classes=2):
-        super(DeepfakeDetectorCNN, self).__init__()
-        
-        # Convolutional layers with HIGHER dropout
-        self.conv_layers = nn.Sequential(
-            # First conv block
-            nn.Conv2d(1, 32, kernel_size=3, padding=1),
-            nn.BatchNorm2d(32),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Dropout(0.4),  # INCREASED from 0.25
-            
-            # Second conv block
-            nn.Conv2d(32, 64, kernel_size=3, padding=1),
-            nn.BatchNorm2d(64),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Dropout(0.4),  # INCREASED from 0.25
-            
-            # Third conv block
-            nn.Conv2d(64, 128, kernel_size=3, padding=1),
-            nn.BatchNorm2d(128),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Dropout(0.5),  # INCREASED from 0.25
-            
-            # Fourth conv block
-            nn.Conv2d(128, 256, kernel_size=3, padding=1),
-            nn.BatchNorm2d(256),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Dropout(0.5),  # INCREASED from 0.25
-        )
+def build_feature_shard(audio_paths, labels, feature_extractor, shard_path,
+                        dtype=np.float16, batch_size=32):
+    """Extract features for a file list into one memory-mapped (N, n_mels, max_len) array
+    
+    Writes <shard_path>.npy with the features and <shard_path>.json with the
+    labels, source paths and extractor fingerprint. Read it back with
+    FeatureShardDataset.
+    """
+    shard_path = Path(shard_path).with_suffix('.npy')
+    shard_path.parent.mkdir(parents=True, exist_ok=True)
+    shape = (len(audio_paths), feature_extractor.n_mels, feature_extractor.max_len)
+    
+    features = np.lib.format.open_memmap(shard_path, mode='w+', dtype=dtype, shape=shape)
+    failed = []
+    
+    for start in range(0, len(audio_paths), batch_size):
+        paths = audio_paths[start:start + batch_size]
+        waveforms = [feature_extractor.load_waveform(path) for path in paths]
+        rows = [start + i for i, y in enumerate(waveforms) if y is not None]
+        failed.extend(str(path) for path, y in zip(paths, waveforms) if y is None)
+        
+        batch = feature_extractor.extract_batch([y for y in waveforms if y is not None])
+        features[rows] = batch[:, 0].numpy().astype(dtype)
+        print(f"📦 Shard {shard_path.name}: {min(start + batch_size, len(audio_paths))}/{len(audio_paths)} clips")
+    
+    features.flush()
+    del features
+    
+    index = {
+        'feature_key': feature_extractor.cache_key(),
+        'dtype': np.dtype(dtype).name,
+        'shape': list(shape),
+        'labels': [int(label) for label in labels],
+        'paths': [str(path) for path in audio_paths],
+        'failed': failed
+    }
+    with open(shard_path.with_suffix('.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+    
+    print(f"✅ Feature shard written to {shard_path} ({len(failed)} failed clips zero-filled)")
+    return shard_path
+
+class FeatureShardDataset(Dataset):
+    """Dataset that reads features straight out of a shard built by build_feature_shard"""
+    
+    def __init__(self, shard_path):
+        self.shard_path = Path(shard_path).with_suffix('.npy')
+        with open(self.shard_path.with_suffix('.json')) as f:
+            self.index = json.load(f)
         
-        # Calculate the size of flattened features
-        # After 4 max pools (2x2), 128x128 becomes 8x8
-        self.fc_layers = nn.Sequential(
-            nn.Linear(256 * 8 * 8, 512),
-            nn.ReLU(),
-            nn.Dropout(0.6),  # INCREASED from 0.5
-            nn.Linear(512, 128),
-            nn.ReLU(),
-            nn.Dropout(0.6),  # INCREASED from 0.5
-            nn.Linear(128, num_classes)
-        )
+        self.labels = torch.tensor(self.index['labels'], dtype=torch.long)
         
-    def forward(self, x):
-        x = self.conv_layers(x)
-        x = x.view(x.size(0), -1)  # Flatten
-        x = self.fc_layers(x)
-        return x
+        # Mapped lazily so every DataLoader worker maps the file itself and the
+        # pages are shared through the OS cache instead of copied per worker
+        self._features = None
+    
+    @property
+    def features(self):
+        if self._features is None:
+            # Copy-on-write mapping: writable for torch.from_numpy, but never copied unless written
+            self._features = np.load(self.shard_path, mmap_mode='c')
+        return self._features
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_features'] = None
+        return state
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    def __getitem__(self, idx):
+        # Zero-copy for float32 shards; float16 shards are widened here
+        features = self.features[idx]
+        if features.dtype != np.float32:
+            features = features.astype(np.float32)
+        
+        return torch.from_numpy(features).unsqueeze(0), self.labels[idx]
+    
+    def __getitems__(self, indices):
+        """Batched fetch: one gather from the mapped array per batch"""
+        batch = torch.from_numpy(self.features[indices].astype(np.float32, copy=False)).unsqueeze(1)
+        return list(zip(batch, self.labels[indices]))
+
+# STEP 7: CNN Model Architecture (DeepfakeDetectorCNN lives in detector_core.py)
+
+def _init_loader_worker(worker_id):
+    """DataLoader worker setup: one thread per worker, then a warm extractor"""
+    torch.set_num_threads(1)
+    
+    dataset = torch.utils.data.get_worker_info().dataset
+    feature_extractor = getattr(dataset, 'feature_extractor', None)
+    if feature_extractor is not None:
+        feature_extractor.fft_workers = 1
+        feature_extractor.warmup()
+
+def create_data_loaders(train_dataset, val_dataset, batch_size, device, num_workers=None):
+    """Build train/val loaders that extract features in parallel worker processes
+    
+    Workers are persistent across epochs and prefetch batches, so decoding and
+    mel extraction overlap with the forward/backward pass in train_model.
+    num_workers=0 keeps everything on the training thread.
+    """
+    if num_workers is None:
+        num_workers = min(4, os.cpu_count() or 1)
+    
+    loader_kwargs = {
+        'batch_size': batch_size,
+        'num_workers': num_workers,
+        'pin_memory': device.type == 'cuda'
+    }
+    if num_workers > 0:
+        loader_kwargs.update(
+            persistent_workers=True,
+            prefetch_factor=4,
+            worker_init_fn=_init_loader_worker
+        )
+    
+    train_loader = DataLoader(train_dataset, shuffle=True, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, shuffle=False, **loader_kwargs)
+    
+    return train_loader, val_loader
 
 # STEP 8: Training Function (FIXED TO PREVENT OVERTRAINING)
 def train_model(model, train_loader, val_loader, num_epochs=12, device='cpu'):  # REDUCED epochs
@@ -351,7 +448,7 @@ def train_model(model, train_loader, val_loader, num_epochs=12, device='cpu'):
         train_total = 0
         
         for batch_idx, (data, targets) in enumerate(train_loader):
-            data, targets = data.to(device), targets.to(device)
+            data, targets = data.to(device, non_blocking=True), targets.to(device, non_blocking=True)
             
             optimizer.zero_grad()
             outputs = model(data)
@@ -376,7 +473,7 @@ def train_model(model, train_loader, val_loader, num_epochs=12, device='cpu'):
         
         with torch.no_grad():
             for data, targets in val_loader:
-                data, targets = data.to(device), targets.to(device)
+                data, targets = data.to(device, non_blocking=True), targets.to(device, non_blocking=True)
                 outputs = model(data)
                 loss = criterion(outputs, targets)
                 
@@ -429,11 +526,10 @@ class RealTimeDetector:
     """Real-time audio deepfake detection"""
     
     def __init__(self, model_path, device='cpu'):
-        self.device = device
-        self.model = DeepfakeDetectorCNN()
-        self.model.load_state_dict(torch.load(model_path, map_location=device))
-        self.model.eval()
-        self.model.to(device)
+        import pyaudio
+        self.pyaudio = pyaudio  # Imported once here; the stream callback runs per buffer
+        
+        self.model, self.device = load_detector_model(model_path, torch.device(device))
         
         self.feature_extractor = AudioFeatureExtractor()
         self.audio_queue = queue.Queue()
@@ -450,7 +546,7 @@ class RealTimeDetector:
         """Callback for audio stream"""
         if self.is_monitoring:
             self.audio_queue.put(in_data)
-        return (in_data, pyaudio.paContinue)
+        return (in_data, self.pyaudio.paContinue)
     
     def predict_audio_chunk(self, audio_data):
         """Predict if audio chunk is fake"""
@@ -459,12 +555,8 @@ class RealTimeDetector:
             audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32)
             audio_np = audio_np / 32768.0  # Normalize
             
-            # Save temporary file for feature extraction
-            temp_file = "temp_audio.wav"
-            sf.write(temp_file, audio_np, self.RATE)
-            
-            # Extract features
-            features = self.feature_extractor.extract_mel_spectrogram(temp_file)
+            # Extract features straight from the buffer
+            features = self.feature_extractor.extract_from_array(audio_np, self.RATE)
             
             if features is None:
                 return 0.5, "Error"
@@ -480,9 +572,6 @@ class RealTimeDetector:
                 
                 prediction = "FAKE" if fake_prob > 0.5 else "REAL"
                 
-            # Clean up temp file
-            os.remove(temp_file)
-            
             return fake_prob, prediction
             
         except Exception as e:
@@ -495,7 +584,7 @@ class RealTimeDetector:
         print(f"Alert threshold: {alert_threshold}")
         print("Speak into your microphone...")
         
-        audio = pyaudio.PyAudio()
+        audio = self.pyaudio.PyAudio()
         
         stream = audio.open(
             format=self.FORMAT,
@@ -543,26 +632,37 @@ class RealTimeDetector:
             audio.terminate()
 
 # STEP 10: Gradio Interface
-def create_gradio_interface(model_path):
-    """Create Gradio web interface"""
+def create_gradio_interface(model_path, hop_seconds=1.0):
+    """Create Gradio web interface (uploads longer than 5s are scored end to end every hop_seconds)"""
+    import gradio as gr
     
     # Load model
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    model = DeepfakeDetectorCNN()
-    model.load_state_dict(torch.load(model_path, map_location=device))
-    model.eval()
-    model.to(device)
+    model, device = load_detector_model(model_path, device)  # Fused + frozen, or a .pt TorchScript file
     
     feature_extractor = AudioFeatureExtractor()
     
+    # Pay for librosa/numba JIT and oneDNN setup before the interface takes uploads
+    feature_extractor.warmup()
+    warmup_model(model, device)
+    
     def predict_audio_file(audio_file):
         """Predict if uploaded audio is fake"""
         try:
             if audio_file is None:
                 return "Please upload an audio file"
             
+            y = feature_extractor.load_waveform(audio_file, full=True)
+            if y is None:
+                return "Error processing audio file"
+            
+            # Long recordings: timeline over the whole file instead of the first seconds only
+            if len(y) > feature_extractor.duration * feature_extractor.sample_rate:
+                return format_long_form(score_long_form(model, device, feature_extractor, y,
+                                                        feature_extractor.sample_rate, hop_seconds))
+            
             # Extract features
-            features = feature_extractor.extract_mel_spectrogram(audio_file)
+            features = feature_extractor.extract_from_array(y, feature_extractor.sample_rate)
             
             if features is None:
                 return "Error processing audio file"
@@ -593,6 +693,28 @@ def create_gradio_interface(model_path):
         except Exception as e:
             return f"Error: {str(e)}"
     
+    def format_long_form(report):
+        """Markdown verdict plus one timeline row per segment"""
+        timeline = '\n'.join(
+            f"| {segment['start']:.1f}s - {segment['end']:.1f}s | "
+            f"{'🔴' if segment['fake_probability'] > 0.5 else '🟢'} {segment['fake_probability']:.1%} |"
+            for segment in report['segments'])
+        
+        return f"""
+🎯 **Prediction Results** ({report['duration']:.1f}s, {len(report['segments'])} segments):
+
+🟢 **Real Voice**: {report['real_probability']:.1%}
+🔴 **AI Generated**: {report['fake_probability']:.1%} (highest segment {report['max_fake_probability']:.1%})
+
+**Verdict**: {'🚨 LIKELY AI GENERATED' if report['prediction'] == 'FAKE' else '✅ LIKELY REAL VOICE'}
+
+**Segments judged AI generated**: {report['fake_fraction']:.0%}
+
+| Segment | AI Generated |
+|---|---|
+{timeline}
+"""
+    
     # Create interface
     interface = gr.Interface(
         fn=predict_audio_file,
@@ -616,6 +738,8 @@ def create_gradio_interface(model_path):
 # STEP 11: Main execution function (FIXED)
 def main():
     """Main function to run everything"""
+    from sklearn.model_selection import train_test_split
+    
     print("🚀 Building Audio Deepfake Detector (FIXED VERSION)!")
     print("=" * 50)
     
@@ -662,17 +786,19 @@ def main():
     
     # Create datasets
     feature_extractor = AudioFeatureExtractor()
-    train_dataset = AudioDataset(train_files, train_labels, feature_extractor)
-    val_dataset = AudioDataset(val_files, val_labels, feature_extractor)
+    feature_cache = FeatureCache(feature_extractor)  # Epochs after the first read cached features
+    train_dataset = AudioDataset(train_files, train_labels, feature_extractor, cache=feature_cache)
+    val_dataset = AudioDataset(val_files, val_labels, feature_extractor, cache=feature_cache)
+    
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
     # Create data loaders with SMALLER batch size
     batch_size = min(4, len(train_files) // 10)  # Smaller batches
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
+    train_loader, val_loader = create_data_loaders(train_dataset, val_dataset, batch_size, device)
+    print(f"Data loader workers: {train_loader.num_workers}")
     
     # Step 4: Train model
     print("\n🧠 Training model with overtraining prevention...")
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
     
     model = DeepfakeDetectorCNN()
@@ -1,16 +1,13 @@
 import torch
 import gradio as gr
-from deepfake_detector import DeepfakeDetectorCNN, AudioFeatureExtractor
+from detector_core import AudioFeatureExtractor, load_detector_model
 
 def create_demo():
     """Create and launch Gradio demo"""
     
     # Load model
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    model = DeepfakeDetectorCNN()
-    model.load_state_dict(torch.load('models/best_deepfake_detector.pth', map_location=device))
-    model.eval()
-    model.to(device)
+    model, device = load_detector_model('models/best_deepfake_detector.pth', device)
     
     feature_extractor = AudioFeatureExtractor()
     
@@ -23,6 +23,8 @@ import winsound
 import traceback
 import requests
 import tempfile
+from streaming_features import AudioRingBuffer, IncrementalMelSpectrogram
+from onnx_backend import LocalOnnxDetector, find_onnx_model
 
 class StreamingDeepfakeMonitor:
     """Real-time streaming deepfake detection system"""
@@ -49,10 +51,16 @@ class StreamingDeepfakeMonitor:
         self.alert_popup = True
         self.log_detections = True
         
-        # Streaming audio buffer
-        self.streaming_buffer = []
-        self.buffer_duration = 0.0
-        self.buffer_lock = threading.Lock()
+        # Streaming audio buffer - preallocated ring written by the capture thread
+        # and read by the analysis thread without locks. Capacity has 2s of slack
+        # over the 10s analysis window so a view being read is not overwritten.
+        self.MAX_BUFFER_SECONDS = 10.0
+        self.streaming_buffer = AudioRingBuffer(int(self.RATE * (self.MAX_BUFFER_SECONDS + 2.0)))
+        
+        # Incremental log-mel features of the latest window - each tick only
+        # computes STFT frames for the audio captured since the previous tick
+        self.mel_stream = IncrementalMelSpectrogram(sample_rate=self.RATE)
+        self.samples_analyzed = 0
         
         # Detection tracking - smart alert management
         self.detection_history = []
@@ -79,6 +87,31 @@ class StreamingDeepfakeMonitor:
         
         # Install dependencies
         self.install_dependencies()
+        
+        # Inference backend - chosen once at startup (LION_INFERENCE_BACKEND=auto|local|remote)
+        self.local_detector = None
+        self.inference_backend = self.select_inference_backend(
+            os.environ.get('LION_INFERENCE_BACKEND', 'auto').lower()
+        )
+    
+    def select_inference_backend(self, requested):
+        """Load the local ONNX model if requested/available, otherwise use the HF Space"""
+        if requested == 'remote':
+            return 'remote'
+        
+        model_path = find_onnx_model()
+        if model_path is None:
+            if requested == 'local':
+                print("⚠️ Local backend requested but no deepfake_detector.onnx found - using remote API")
+            return 'remote'
+        
+        try:
+            self.local_detector = LocalOnnxDetector(model_path, suspicious_threshold=self.alert_threshold)
+            print(f"🧠 Local ONNX backend loaded: {model_path}")
+            return 'local'
+        except Exception as e:
+            print(f"⚠️ Could not load local ONNX backend ({e}) - using remote API")
+            return 'remote'
     
     def install_dependencies(self):
         """Install required packages if missing"""
@@ -468,15 +501,8 @@ Need help? Visit our support page or contact us."""
                     data = stream.read(self.CHUNK, exception_on_overflow=False)
                     audio_np = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
                     
-                    # Add to streaming buffer
-                    with self.buffer_lock:
-                        self.streaming_buffer.append(audio_np)
-                        self.buffer_duration += len(audio_np) / self.RATE
-                        
-                        # Keep buffer size manageable (max 10 seconds for maximum context)
-                        while self.buffer_duration > 10.0:
-                            removed_chunk = self.streaming_buffer.pop(0)
-                            self.buffer_duration -= len(removed_chunk) / self.RATE
+                    # Add to streaming buffer (oldest audio is overwritten in place)
+                    self.streaming_buffer.write(audio_np)
                     
                 except Exception as e:
                     print(f"Audio capture error: {e}")
@@ -492,6 +518,20 @@ Need help? Visit our support page or contact us."""
             if 'audio' in locals():
                 audio.terminate()
     
+    def take_new_audio(self, position):
+        """Samples captured since the previous tick, up to ring position `position`"""
+        new_count = position - self.samples_analyzed
+        self.samples_analyzed = position
+        
+        if new_count <= 0:
+            return None
+        
+        if new_count > self.streaming_buffer.capacity:
+            # Audio was overwritten before we saw it - restart the features
+            self.mel_stream.reset()
+        
+        return self.streaming_buffer.read_latest(new_count, end=position)
+    
     def streaming_analysis_thread(self):
         """Streaming analysis thread - processes audio every 500ms"""
         import asyncio
@@ -509,17 +549,20 @@ Need help? Visit our support page or contact us."""
                 if not self.is_monitoring:
                     break
                 
-                # Get current buffer
-                with self.buffer_lock:
-                    if len(self.streaming_buffer) == 0 or self.buffer_duration < 4.0:  # Need 4+ seconds of context
-                        continue
-                        
-                    # Copy buffer for processing
-                    buffer_copy = list(self.streaming_buffer)
-                    duration = self.buffer_duration
+                # Snapshot the write position once so every read below sees the same audio
+                position = self.streaming_buffer.total_written
+                
+                # Only the newly captured hops go through the STFT
+                new_audio = self.take_new_audio(position)
+                if new_audio is not None:
+                    self.mel_stream.push(new_audio)
                 
-                # Calculate volume
-                combined_audio = np.concatenate(buffer_copy)
+                duration = min(position / self.RATE, self.MAX_BUFFER_SECONDS)
+                if duration < 4.0:  # Need 4+ seconds of context
+                    continue
+                
+                # Latest window as a view into the ring - no copy, no concatenation
+                combined_audio = self.streaming_buffer.read_latest(int(duration * self.RATE), end=position)
                 volume = self.calculate_rms(combined_audio)
                 
                 # Skip if too quiet (but be very sensitive)
@@ -545,13 +588,24 @@ Need help? Visit our support page or contact us."""
         start_time = time.time()
         
         try:
-            # Create larger WAV blob with more audio context
-            wav_blob = self.create_wav_blob(audio_data, self.RATE)
             audio_duration = len(audio_data) / self.RATE
-            print(f"📦 Analyzing LARGE stream #{chunk_id}: {len(wav_blob)} bytes ({audio_duration:.1f}s audio)")
+            result = None
             
-            # Send to API with larger chunk
-            result = await self.send_to_streaming_api(wav_blob)
+            if self.local_detector is not None:
+                # In-process inference on the incrementally maintained mel window
+                try:
+                    result = self.local_detector.predict(self.mel_stream.log_mel())
+                    result['backend'] = 'local'
+                except Exception as e:
+                    print(f"⚠️ Local inference failed ({e}), falling back to remote API")
+            
+            if result is None:
+                # Create larger WAV blob with more audio context
+                wav_blob = self.create_wav_blob(audio_data, self.RATE)
+                print(f"📦 Analyzing LARGE stream #{chunk_id}: {len(wav_blob)} bytes ({audio_duration:.1f}s audio)")
+                
+                # Send to API with larger chunk
+                result = await self.send_to_streaming_api(wav_blob)
             
             if result and not result.get('error'):
                 latency = int((time.time() - start_time) * 1000)
@@ -565,7 +619,7 @@ Need help? Visit our support page or contact us."""
                 result['chunk_id'] = chunk_id
                 result['latency'] = latency
                 result['audio_duration'] = audio_duration
-                result['source'] = 'Desktop Stream (Large Chunks)'
+                result['source'] = 'Desktop Stream (Local ONNX)' if result.get('backend') == 'local' else 'Desktop Stream (Large Chunks)'
                 
                 self.handle_streaming_result(result)
             else:
@@ -838,6 +892,11 @@ Need help? Visit our support page or contact us."""
     def start_monitoring(self, icon=None, item=None):
         """Start real-time streaming monitoring"""
         if not self.is_monitoring:
+            # Clear buffered audio before the threads start
+            self.streaming_buffer.clear()
+            self.samples_analyzed = 0
+            self.mel_stream.reset()
+            
             self.is_monitoring = True
             
             # Start audio capture thread
@@ -866,11 +925,6 @@ Need help? Visit our support page or contact us."""
         if self.is_monitoring:
             self.is_monitoring = False
             
-            # Clear detection state
-            with self.buffer_lock:
-                self.streaming_buffer.clear()
-                self.buffer_duration = 0.0
-            
             # Reset detection event state
             self.in_detection_event = False
             self.consecutive_detections = 0
@@ -943,6 +997,7 @@ Current Settings:
 - Alert Popup: {self.alert_popup}
 - Log Detections: {self.log_detections}
 - Sample Rate: {self.RATE}Hz
+- Inference Backend: {self.inference_backend}
         """
         
         print(settings)
@@ -988,6 +1043,7 @@ Current Settings:
         print(f"🎯 Alert threshold: {self.alert_threshold}")
         print(f"⚡ Streaming interval: {self.STREAM_INTERVAL}s")
         print(f"🌐 API endpoint: {self.HF_API_URL}")
+        print(f"🧠 Inference backend: {self.inference_backend}")
         print("📋 Right-click system tray icon to start monitoring")
         
         # Show first-time setup for new users
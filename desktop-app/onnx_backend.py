@@ -0,0 +1,65 @@
+# Local ONNX Runtime backend for the desktop monitor
+# Runs onnx_models/deepfake_detector.onnx (made by convert_to_onnx.py) in-process on CPU
+
+import os
+import sys
+from datetime import datetime
+import numpy as np
+
+MODEL_FILENAME = 'deepfake_detector.onnx'
+
+def find_onnx_model():
+    """Locate the exported model: LION_ONNX_MODEL, the PyInstaller bundle, then onnx_models/"""
+    candidates = []
+    
+    if os.environ.get('LION_ONNX_MODEL'):
+        candidates.append(os.environ['LION_ONNX_MODEL'])
+    
+    if getattr(sys, 'frozen', False):
+        bundle_dir = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
+        candidates.append(os.path.join(bundle_dir, MODEL_FILENAME))
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    candidates.extend([
+        os.path.join(script_dir, MODEL_FILENAME),
+        os.path.join('onnx_models', MODEL_FILENAME),
+        os.path.join(script_dir, '..', 'onnx_models', MODEL_FILENAME)
+    ])
+    
+    for path in candidates:
+        if os.path.exists(path):
+            return os.path.abspath(path)
+    return None
+
+class LocalOnnxDetector:
+    """In-process deepfake detection on (128, 128) log-mel windows"""
+    
+    def __init__(self, model_path, suspicious_threshold=0.3, num_threads=1):
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # One window per tick - a single thread avoids contending with audio capture
+        options.intra_op_num_threads = num_threads
+        
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.suspicious_threshold = suspicious_threshold
+    
+    def predict(self, mel_spec_db):
+        """Score one log-mel window; returns the same dict shape as the remote API parser"""
+        features = np.ascontiguousarray(mel_spec_db, dtype=np.float32)[np.newaxis, np.newaxis]
+        logits = self.session.run(None, {self.input_name: features})[0][0]
+        
+        exp = np.exp(logits - logits.max())
+        real_prob, fake_prob = (exp / exp.sum()).tolist()
+        
+        return {
+            'prediction': 'FAKE' if fake_prob > real_prob else 'REAL',
+            'confidence': max(real_prob, fake_prob),
+            'probabilities': {'real': real_prob, 'fake': fake_prob},
+            'is_suspicious': fake_prob > self.suspicious_threshold,
+            'timestamp': datetime.now().isoformat()
+        }
\ No newline at end of file
@@ -0,0 +1,191 @@
+# Streaming Feature Extraction - incremental mel-spectrogram for the desktop monitor
+# Pure NumPy (no librosa) so the PyInstaller build stays small
+
+import numpy as np
+
+def hz_to_mel(freqs):
+    """Slaney mel scale (librosa's default, htk=False)"""
+    freqs = np.asanyarray(freqs, dtype=np.float64)
+    f_sp = 200.0 / 3
+    mels = freqs / f_sp
+    
+    # Log scale above 1 kHz
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    log_region = freqs >= min_log_hz
+    mels = np.where(log_region, min_log_mel + np.log(np.maximum(freqs, min_log_hz) / min_log_hz) / logstep, mels)
+    return mels
+
+def mel_to_hz(mels):
+    """Inverse of hz_to_mel"""
+    mels = np.asanyarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    freqs = f_sp * mels
+    
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    log_region = mels >= min_log_mel
+    freqs = np.where(log_region, min_log_hz * np.exp(logstep * (mels - min_log_mel)), freqs)
+    return freqs
+
+def mel_filterbank(sample_rate, n_fft, n_mels):
+    """Slaney-normalised mel filterbank, same as librosa.filters.mel defaults"""
+    fft_freqs = np.fft.rfftfreq(n_fft, d=1.0 / sample_rate)
+    mel_freqs = mel_to_hz(np.linspace(hz_to_mel(0.0), hz_to_mel(sample_rate / 2.0), n_mels + 2))
+    
+    fdiff = np.diff(mel_freqs)
+    ramps = mel_freqs[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    
+    # Slaney normalisation: constant energy per band
+    weights *= (2.0 / (mel_freqs[2:n_mels + 2] - mel_freqs[:n_mels]))[:, None]
+    return weights.astype(np.float32)
+
+def power_to_db(mel_power, amin=1e-10, top_db=80.0):
+    """librosa.power_to_db(S, ref=np.max) with the default top_db"""
+    log_spec = 10.0 * np.log10(np.maximum(amin, mel_power))
+    log_spec -= 10.0 * np.log10(max(amin, float(mel_power.max())))
+    return np.maximum(log_spec, log_spec.max() - top_db)
+
+class IncrementalMelSpectrogram:
+    """Rolling mel-spectrogram that only computes STFT frames for newly arrived audio
+    
+    Frames are centred on multiples of hop_length from the start of the stream,
+    as with librosa's center=True. The last n_frames mel-power columns are kept
+    in a ring, so each push costs time proportional to the new audio, not to
+    the analysis window.
+    """
+    
+    def __init__(self, sample_rate=22050, n_fft=2048, hop_length=512, n_mels=128, n_frames=128):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.n_frames = n_frames
+        
+        # Periodic Hann window, as used by librosa.stft
+        self.window = (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+        self.mel_basis_t = np.ascontiguousarray(mel_filterbank(sample_rate, n_fft, n_mels).T)
+        
+        self.ring = np.zeros((n_mels, n_frames), dtype=np.float32)
+        self.reset()
+    
+    def reset(self):
+        """Forget all audio; the next push starts a new stream"""
+        self.ring[:] = 0.0
+        self.write_index = 0
+        self.frames_filled = 0
+        self.total_frames = 0
+        
+        # Half a window of silence stands in for librosa's centre padding
+        self.pending = np.zeros(self.n_fft // 2, dtype=np.float32)
+    
+    @property
+    def is_full(self):
+        return self.frames_filled >= self.n_frames
+    
+    def push(self, samples):
+        """Add new audio and compute mel frames for every complete hop; returns frames added"""
+        buffer = np.concatenate([self.pending, np.asarray(samples, dtype=np.float32)])
+        
+        if len(buffer) < self.n_fft:
+            self.pending = buffer
+            return 0
+        
+        n_new = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_new]
+        
+        # Frames older than the ring would be overwritten straight away
+        frames = frames[-self.n_frames:]
+        spectrum = np.fft.rfft(frames * self.window, axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        self._write((power @ self.mel_basis_t).T)
+        
+        self.total_frames += n_new
+        self.pending = buffer[n_new * self.hop_length:].copy()
+        return n_new
+    
+    def _write(self, mel_frames):
+        n = mel_frames.shape[1]
+        end = self.write_index + n
+        
+        if end <= self.n_frames:
+            self.ring[:, self.write_index:end] = mel_frames
+        else:
+            split = self.n_frames - self.write_index
+            self.ring[:, self.write_index:] = mel_frames[:, :split]
+            self.ring[:, :end - self.n_frames] = mel_frames[:, split:]
+        
+        self.write_index = end % self.n_frames
+        self.frames_filled = min(self.n_frames, self.frames_filled + n)
+    
+    def mel_power(self):
+        """Latest (n_mels, frames_filled) mel power, oldest frame first"""
+        if not self.is_full:
+            return self.ring[:, :self.frames_filled].copy()
+        return np.concatenate([self.ring[:, self.write_index:], self.ring[:, :self.write_index]], axis=1)
+    
+    def log_mel(self):
+        """Latest window as the model's (n_mels, n_frames) dB input, zero-padded while filling"""
+        mel_spec_db = power_to_db(self.mel_power()) if self.frames_filled else np.zeros((self.n_mels, 0))
+        
+        if mel_spec_db.shape[1] < self.n_frames:
+            mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, self.n_frames - mel_spec_db.shape[1])),
+                                 mode='constant')
+        
+        return mel_spec_db.astype(np.float32)
+
+class AudioRingBuffer:
+    """Preallocated float32 ring for one producer thread and one consumer thread
+    
+    Every sample is stored twice (at i and i + capacity), so the latest N
+    samples are always contiguous and read_latest returns a view instead of a
+    copy. Only the producer advances total_written, after the samples are in
+    place, so the consumer never needs a lock. A view stays valid until the
+    producer has written (capacity - N) more samples; copy it if it must live
+    longer than that.
+    """
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=np.float32)
+        self.total_written = 0
+    
+    def clear(self):
+        """Drop all audio (only while neither thread is using the ring)"""
+        self.total_written = 0
+    
+    def available(self, end=None):
+        """Number of samples that can currently be read"""
+        end = self.total_written if end is None else end
+        return min(end, self.capacity)
+    
+    def write(self, samples):
+        """Append samples, overwriting the oldest audio (producer thread only)"""
+        samples = np.asarray(samples, dtype=np.float32)
+        total = len(samples)
+        
+        # Only the tail survives a write longer than the ring, but the stream
+        # position still advances by the full length
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        start = (self.total_written + total - n) % self.capacity
+        first = min(n, self.capacity - start)
+        
+        for offset in (0, self.capacity):
+            self._data[offset + start:offset + start + first] = samples[:first]
+            self._data[offset:offset + n - first] = samples[first:]
+        
+        # Publish only after both copies are written
+        self.total_written += total
+    
+    def read_latest(self, n, end=None):
+        """View of the latest n samples (oldest first), ending at position `end`"""
+        end = self.total_written if end is None else end
+        n = min(n, self.available(end))
+        stop = end % self.capacity + self.capacity
+        return self._data[stop - n:stop]
\ No newline at end of file
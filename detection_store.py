@@ -0,0 +1,167 @@
+# Detection Store - persistent detection history in an embedded SQLite database
+# Writes are queued and committed in batches by a background thread, so request
+# threads never wait on disk. Reads are indexed range/filter queries.
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+COLUMNS = ('id', 'timestamp', 'url', 'source', 'prediction', 'fake_probability',
+           'real_probability', 'confidence', 'is_suspicious')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    url TEXT,
+    source TEXT,
+    prediction TEXT,
+    fake_probability REAL,
+    real_probability REAL,
+    confidence REAL,
+    is_suspicious INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections (timestamp);
+CREATE INDEX IF NOT EXISTS idx_detections_url ON detections (url, timestamp);
+CREATE INDEX IF NOT EXISTS idx_detections_source ON detections (source, timestamp);
+CREATE INDEX IF NOT EXISTS idx_detections_prediction ON detections (prediction, timestamp);
+'''
+
+class DetectionStore:
+    """SQLite-backed detection log
+    
+    add() only queues the detection; a writer thread commits everything
+    queued in one transaction every flush_interval seconds (or once
+    batch_size rows are waiting). Queries may therefore miss detections
+    from the last flush_interval. Timestamps are ISO-8601 strings, so time
+    ranges are plain string comparisons on the timestamp index.
+    """
+    
+    def __init__(self, db_path='data/detections.db', flush_interval=0.5, batch_size=256):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        
+        self.local = threading.local()
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        # WAL lets readers run while the writer commits
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def _reader(self):
+        """One read connection per thread"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+            conn.row_factory = sqlite3.Row
+        return conn
+    
+    def add(self, detection):
+        """Queue one detection dict (with an 'id') for the next batch"""
+        self.pending.put(tuple(detection.get(column) for column in COLUMNS))
+    
+    def _collect_batch(self):
+        """Block for the first item, then gather more until batch_size or flush_interval"""
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.flush_interval
+        
+        while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _write_loop(self):
+        conn = self._connect()
+        
+        while True:
+            batch = self._collect_batch()
+            rows = [item for item in batch if isinstance(item, tuple)]
+            
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO detections ({', '.join(COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            except sqlite3.Error as e:
+                print(f"❌ Error writing detections: {e}")
+            
+            # A control item always ends a batch: None stops, an Event asks for a clear
+            control = batch[-1]
+            if control is None:
+                conn.close()
+                return
+            if isinstance(control, threading.Event):
+                with conn:
+                    conn.execute('DELETE FROM detections')
+                control.set()
+    
+    def close(self):
+        """Write everything still queued and stop the writer thread"""
+        self.pending.put(None)
+        self.writer.join()
+    
+    def last_id(self):
+        """Highest stored id, so new ids continue after a restart"""
+        row = self._reader().execute('SELECT MAX(id) FROM detections').fetchone()
+        return row[0] or 0
+    
+    def query(self, start=None, end=None, url=None, source=None, prediction=None,
+              after_id=None, limit=50):
+        """Up to `limit` matching detections, oldest first
+        
+        start/end bound the timestamp (inclusive, ISO-8601). Without after_id
+        this is the newest `limit` matches; with it, the first `limit` matches
+        after that cursor, so callers can page forward.
+        """
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')  # LIMIT -1 would return every row
+        
+        clauses, params = [], []
+        for clause, value in (('timestamp >= ?', start), ('timestamp <= ?', end),
+                              ('url = ?', url), ('source = ?', source),
+                              ('prediction = ?', prediction), ('id > ?', after_id)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        order = 'ASC' if after_id is not None else 'DESC'
+        rows = self._reader().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM detections {where} ORDER BY id {order} LIMIT ?",
+            params + [limit]).fetchall()
+        
+        if order == 'DESC':
+            rows.reverse()
+        
+        detections = []
+        for row in rows:
+            detection = dict(row)
+            detection['is_suspicious'] = bool(detection['is_suspicious'])
+            detections.append(detection)
+        return detections
+    
+    def clear(self):
+        """Delete every stored detection, including any still queued"""
+        done = threading.Event()
+        self.pending.put(done)
+        done.wait()
\ No newline at end of file
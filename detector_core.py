@@ -0,0 +1,707 @@
+# Detector Core - model and feature extraction only
+# Lightweight import for serving and export scripts: no gradio, pyaudio,
+# matplotlib, pandas or sklearn. Training and UI code live in deepfake_detector.py.
+
+import copy
+import functools
+import hashlib
+import io
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import librosa
+import scipy.fft
+import soundfile as sf
+
+# Feature Extraction
+# Bump when the feature computation changes so cached features are rebuilt
+FEATURE_VERSION = 1
+
+# Four 2x2 max pools: shorter inputs have no time axis left for the classifier
+MIN_FRAMES = 16
+
+@functools.lru_cache(maxsize=None)
+def _mel_filterbank(sample_rate, n_fft, n_mels):
+    """Mel filterbank shared by every extractor with the same parameters"""
+    mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+    mel_basis.setflags(write=False)
+    return mel_basis
+
+@functools.lru_cache(maxsize=None)
+def _stft_window(n_fft):
+    """Periodic Hann window, as librosa.stft builds it"""
+    window = librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+class AudioFeatureExtractor:
+    """Extract features from audio files"""
+    
+    def __init__(self, sample_rate=22050, n_mels=128, max_len=128, duration=5.0,
+                 n_fft=2048, hop_length=512):
+        self.sample_rate = sample_rate
+        self.n_mels = n_mels
+        self.max_len = max_len
+        self.duration = duration
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        
+        # Built once per parameter set instead of inside every librosa call
+        self.mel_basis = _mel_filterbank(sample_rate, n_fft, n_mels)
+        self.window = _stft_window(n_fft)
+        
+        # Threads for the batched FFT (-1 = all cores); loader workers set this to 1
+        self.fft_workers = -1
+    
+    def extract_mel_spectrogram(self, audio_path):
+        """Extract mel-spectrogram features"""
+        try:
+            # Load audio
+            y, sr = librosa.load(audio_path, sr=self.sample_rate, duration=self.duration)
+            
+            return self._mel_from_waveform(y)
+        
+        except Exception as e:
+            print(f"Error processing {audio_path}: {e}")
+            return None
+    
+    def cache_key(self):
+        """Short fingerprint of every parameter that changes the extracted features"""
+        params = (FEATURE_VERSION, self.sample_rate, self.n_mels, self.max_len,
+                  self.duration, self.n_fft, self.hop_length)
+        return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+    
+    def extract_from_array(self, samples, sr, timings=None):
+        """Extract mel-spectrogram features from an in-memory waveform
+        
+        If a timings dict is given, the seconds spent in the 'resample' and
+        'mel' stages are written into it.
+        """
+        try:
+            start = time.perf_counter()
+            y = self.prepare_waveform(samples, sr)
+            resampled = time.perf_counter()
+            mel_spec_db = self._mel_from_waveform(y)
+            
+            if timings is not None:
+                timings['resample'] = resampled - start
+                timings['mel'] = time.perf_counter() - resampled
+            return mel_spec_db
+        
+        except Exception as e:
+            print(f"Error processing audio buffer: {e}")
+            return None
+    
+    def extract_from_bytes(self, audio_bytes, timings=None):
+        """Extract mel-spectrogram features from an encoded audio file held in memory"""
+        try:
+            # Only decode the part of the file that will be used
+            start = time.perf_counter()
+            with sf.SoundFile(io.BytesIO(audio_bytes)) as f:
+                sr = f.samplerate
+                y = f.read(int(self.duration * sr), dtype='float32')
+            
+            if timings is not None:
+                timings['decode'] = time.perf_counter() - start
+            return self.extract_from_array(y, sr, timings)
+        
+        except Exception as e:
+            print(f"Error decoding audio bytes: {e}")
+            return None
+    
+    def prepare_waveform(self, samples, sr, truncate=True):
+        """Mix down, truncate and resample a waveform the same way librosa.load does
+        
+        truncate=False keeps the whole recording instead of the first duration seconds.
+        """
+        y = np.asarray(samples, dtype=np.float32)
+        
+        # soundfile returns (frames, channels)
+        if y.ndim > 1:
+            y = y.mean(axis=1)
+        
+        if truncate:
+            y = y[:int(self.duration * sr)]
+        
+        if sr != self.sample_rate:
+            y = librosa.resample(y, orig_sr=sr, target_sr=self.sample_rate)
+        
+        return y
+    
+    def _mel_power(self, y):
+        """Mel power spectrogram of the whole waveform, one frame per hop_length samples"""
+        # Extract mel-spectrogram with the cached window and filterbank
+        stft = librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window)
+        return self.mel_basis @ (np.abs(stft) ** 2)
+    
+    def _log_mel(self, y):
+        """Log-mel spectrogram of the whole waveform, in dB relative to its loudest bin"""
+        return librosa.power_to_db(self._mel_power(y), ref=np.max)
+    
+    def _mel_from_waveform(self, y):
+        """Log-mel spectrogram padded or truncated to max_len frames"""
+        mel_spec_db = self._log_mel(y)
+        
+        # Pad or truncate to fixed length
+        if mel_spec_db.shape[1] < self.max_len:
+            mel_spec_db = np.pad(mel_spec_db, 
+                               ((0, 0), (0, self.max_len - mel_spec_db.shape[1])), 
+                               mode='constant')
+        else:
+            mel_spec_db = mel_spec_db[:, :self.max_len]
+        
+        return mel_spec_db
+    
+    def extract_full_from_array(self, samples, sr, min_frames=MIN_FRAMES):
+        """(n_mels, frames) features for the whole waveform, for VariableLengthDetectorCNN
+        
+        Nothing is cut at duration or max_len; recordings shorter than
+        min_frames are zero padded like _mel_from_waveform pads short clips.
+        """
+        try:
+            y = self.prepare_waveform(samples, sr, truncate=False)
+            mel_spec_db = self._log_mel(y)
+            
+            if mel_spec_db.shape[1] < min_frames:
+                mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, min_frames - mel_spec_db.shape[1])),
+                                     mode='constant')
+            return mel_spec_db
+        
+        except Exception as e:
+            print(f"Error processing audio buffer: {e}")
+            return None
+    
+    def extract_full_mel_spectrogram(self, audio_path, min_frames=MIN_FRAMES):
+        """Whole-file counterpart of extract_mel_spectrogram"""
+        try:
+            y, sr = librosa.load(audio_path, sr=self.sample_rate)
+            return self.extract_full_from_array(y, sr, min_frames)
+        
+        except Exception as e:
+            print(f"Error processing {audio_path}: {e}")
+            return None
+    
+    def _mel_power_frames(self, y, first, last):
+        """Mel power of frames [first, last) of the centred STFT of y, without transforming the rest"""
+        half = self.n_fft // 2
+        start = first * self.hop_length - half
+        stop = (last - 1) * self.hop_length + self.n_fft - half
+        
+        # Same zero padding librosa's centred STFT adds at both ends of y
+        segment = y[max(start, 0):min(stop, len(y))]
+        segment = np.pad(segment, (max(-start, 0), max(stop - len(y), 0)))
+        
+        stft = librosa.stft(segment, n_fft=self.n_fft, hop_length=self.hop_length,
+                            window=self.window, center=False)
+        return self.mel_basis @ (np.abs(stft) ** 2)
+    
+    def iter_windows(self, samples, sr, hop_seconds=1.0, batch_size=64):
+        """Model windows every hop_seconds across a whole recording, batch_size windows at a time
+        
+        Yields ((B, 1, n_mels, max_len) float32 tensor, window start times in
+        seconds). A last window is aligned to the end of the recording so the
+        tail is always scored. The mel power is computed per batch for just
+        the frames those windows cover, so memory stays flat however long the
+        recording is. Each window is converted to dB exactly as
+        extract_from_array converts a clip starting at that frame (reference =
+        loudest bin of the following duration seconds), so the first window
+        equals the fixed-length features of the same file.
+        """
+        y = self.prepare_waveform(samples, sr, truncate=False)
+        n_frames = 1 + len(y) // self.hop_length
+        
+        hop_frames = max(1, int(round(hop_seconds * self.sample_rate / self.hop_length)))
+        starts = list(range(0, max(n_frames - self.max_len, 0) + 1, hop_frames))
+        if starts[-1] + self.max_len < n_frames:
+            starts.append(n_frames - self.max_len)
+        
+        ref_frames = 1 + int(self.duration * self.sample_rate) // self.hop_length
+        span = max(self.max_len, ref_frames)
+        
+        for i in range(0, len(starts), batch_size):
+            batch = starts[i:i + batch_size]
+            first, last = batch[0], min(batch[-1] + span, n_frames)
+            
+            # power_to_db(ref=np.max, top_db=80) with the reference taken per window
+            log_mel = 10.0 * np.log10(np.maximum(1e-10, self._mel_power_frames(y, first, last)))
+            frame_max = log_mel.max(axis=0)
+            
+            windows = np.zeros((len(batch), self.n_mels, self.max_len), dtype=np.float32)
+            for j, start in enumerate(batch):
+                offset = start - first
+                window = log_mel[:, offset:offset + self.max_len] - frame_max[offset:offset + ref_frames].max()
+                windows[j, :, :window.shape[1]] = np.maximum(window, -80.0)  # Short recordings stay zero padded
+            
+            yield torch.from_numpy(windows).unsqueeze(1), np.array(batch) * self.hop_length / self.sample_rate
+    
+    def warmup(self):
+        """Run every extraction path once so librosa/numba/soxr setup happens up front"""
+        noise = np.random.default_rng(0).standard_normal(self.sample_rate).astype(np.float32) * 0.01
+        self.extract_from_array(noise, self.sample_rate)
+        self.extract_from_array(noise[:16000], 16000)  # resampling path
+        self.extract_batch([noise, noise[:self.sample_rate // 2]])
+    
+    def load_waveform(self, audio_path, full=False):
+        """Load the part of an audio file used for features (all of it if full), or None on failure"""
+        try:
+            y, _ = librosa.load(audio_path, sr=self.sample_rate,
+                                duration=None if full else self.duration)
+            return y
+        except Exception as e:
+            print(f"Error processing {audio_path}: {e}")
+            return None
+    
+    def extract_batch(self, waveforms, sr=None):
+        """Extract mel-spectrograms for N waveforms as one (N, 1, n_mels, max_len) float32 tensor
+        
+        The STFT and mel projection run as a single vectorized pass over the
+        whole batch, so callers should pass batches sized for memory (each 5s
+        clip needs a few MB of intermediate spectra).
+        """
+        sr = self.sample_rate if sr is None else sr
+        clips = [self.prepare_waveform(w, sr) for w in waveforms]
+        
+        if not clips:
+            return torch.zeros((0, 1, self.n_mels, self.max_len))
+        
+        mel_spec_db = self._batch_mel_db(clips)
+        return torch.from_numpy(mel_spec_db).unsqueeze(1)
+    
+    def _batch_mel_db(self, clips):
+        """Vectorized equivalent of _mel_from_waveform for a list of clips"""
+        n_fft, hop_length = self.n_fft, self.hop_length
+        lengths = np.array([len(y) for y in clips])
+        n_frames = 1 + lengths // hop_length
+        total_frames = int(n_frames.max())
+        
+        # Zero padding matches librosa's centred constant padding, and the extra
+        # frames of shorter clips are masked out below
+        padded = np.zeros((len(clips), (total_frames - 1) * hop_length + n_fft), dtype=np.float32)
+        for i, y in enumerate(clips):
+            padded[i, n_fft // 2:n_fft // 2 + len(y)] = y
+        
+        # (N, T, n_fft) frames -> (N, T, 1 + n_fft // 2) power -> (N, n_mels, T) mel power
+        frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=1)[:, ::hop_length]
+        spectrum = scipy.fft.rfft(frames * self.window, axis=-1, workers=self.fft_workers)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        mel_spec = np.matmul(power, self.mel_basis.T).transpose(0, 2, 1)
+        
+        # power_to_db(ref=np.max, top_db=80) with the reference taken per clip
+        valid = np.arange(total_frames)[None, :] < n_frames[:, None]
+        mel_spec = np.where(valid[:, None, :], mel_spec, 0.0)
+        ref = mel_spec.max(axis=(1, 2), keepdims=True)
+        mel_spec_db = 10.0 * np.log10(np.maximum(1e-10, mel_spec))
+        mel_spec_db -= 10.0 * np.log10(np.maximum(1e-10, ref))
+        db_max = np.where(valid[:, None, :], mel_spec_db, -np.inf).max(axis=(1, 2), keepdims=True)
+        mel_spec_db = np.maximum(mel_spec_db, db_max - 80.0)
+        mel_spec_db = np.where(valid[:, None, :], mel_spec_db, 0.0)
+        
+        # Pad or truncate to fixed length
+        if total_frames < self.max_len:
+            mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, 0), (0, self.max_len - total_frames)),
+                                 mode='constant')
+        
+        return np.ascontiguousarray(mel_spec_db[:, :, :self.max_len], dtype=np.float32)
+    
+    def extract_mfcc_features(self, audio_path):
+        """Extract MFCC features as backup"""
+        try:
+            y, sr = librosa.load(audio_path, sr=self.sample_rate, duration=self.duration)
+            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+            
+            # Pad or truncate
+            if mfccs.shape[1] < self.max_len:
+                mfccs = np.pad(mfccs, 
+                             ((0, 0), (0, self.max_len - mfccs.shape[1])), 
+                             mode='constant')
+            else:
+                mfccs = mfccs[:, :self.max_len]
+            
+            return mfccs
+        except:
+            return None
+
+class StreamingMelSpectrogram:
+    """Rolling log-mel window over a live stream, built on an extractor's cached window and filterbank
+    
+    push() takes audio already at the extractor's sample rate and only
+    computes STFT frames for the new samples; the last max_len mel-power
+    columns are kept in a ring. Frames are centred on multiples of
+    hop_length from the start of the stream with zero padding, as in
+    _mel_from_waveform, so overlapping windows reuse every frame.
+    
+    This is a deliberate copy of IncrementalMelSpectrogram in
+    desktop-app/streaming_features.py. The desktop executable is built from
+    desktop-app/ alone and stays NumPy-only, so it cannot import this module
+    (librosa, torch), and root modules cannot import from the hyphenated
+    desktop-app/ directory. Fixes to push() belong in both.
+    """
+    
+    def __init__(self, feature_extractor):
+        self.n_fft = feature_extractor.n_fft
+        self.hop_length = feature_extractor.hop_length
+        self.n_frames = feature_extractor.max_len
+        self.window = feature_extractor.window
+        self.mel_basis = feature_extractor.mel_basis
+        
+        self.ring = np.zeros((self.mel_basis.shape[0], self.n_frames), dtype=np.float32)
+        self.reset()
+    
+    def reset(self):
+        """Forget all audio; the next push starts a new stream"""
+        self.ring[:] = 0.0
+        self.write_index = 0
+        self.frames_filled = 0
+        self.total_frames = 0
+        
+        # Half a window of silence stands in for the centre padding
+        self.pending = np.zeros(self.n_fft // 2, dtype=np.float32)
+    
+    @property
+    def is_full(self):
+        return self.frames_filled >= self.n_frames
+    
+    def push(self, samples):
+        """Add new audio and compute mel frames for every complete hop; returns frames added"""
+        buffer = np.concatenate([self.pending, np.asarray(samples, dtype=np.float32)])
+        
+        if len(buffer) < self.n_fft:
+            self.pending = buffer
+            return 0
+        
+        n_new = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_new]
+        
+        # Frames older than the ring would be overwritten straight away
+        frames = frames[-self.n_frames:]
+        spectrum = scipy.fft.rfft(frames * self.window, axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        mel_frames = (self.mel_basis @ power.T).astype(np.float32)
+        
+        n = mel_frames.shape[1]
+        end = self.write_index + n
+        if end <= self.n_frames:
+            self.ring[:, self.write_index:end] = mel_frames
+        else:
+            split = self.n_frames - self.write_index
+            self.ring[:, self.write_index:] = mel_frames[:, :split]
+            self.ring[:, :end - self.n_frames] = mel_frames[:, split:]
+        
+        self.write_index = end % self.n_frames
+        self.frames_filled = min(self.n_frames, self.frames_filled + n)
+        self.total_frames += n_new
+        self.pending = buffer[n_new * self.hop_length:].copy()
+        return n_new
+    
+    def log_mel(self):
+        """Latest window as the model's (n_mels, max_len) dB input, zero-padded while filling"""
+        if self.is_full:
+            mel_spec = np.concatenate([self.ring[:, self.write_index:], self.ring[:, :self.write_index]], axis=1)
+        else:
+            mel_spec = self.ring[:, :self.frames_filled]
+        
+        if not self.frames_filled:
+            return np.zeros_like(self.ring)
+        
+        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
+        if mel_spec_db.shape[1] < self.n_frames:
+            mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, self.n_frames - mel_spec_db.shape[1])),
+                                 mode='constant')
+        
+        return mel_spec_db.astype(np.float32)
+
+# Process-pool feature extraction
+# Each worker process keeps one warm extractor; audio is passed through shared memory
+_worker_extractor = None
+
+def _init_feature_worker(extractor_kwargs):
+    global _worker_extractor
+    
+    # Parallelism comes from the processes, not from threads inside each one
+    torch.set_num_threads(1)
+    _worker_extractor = AudioFeatureExtractor(**extractor_kwargs)
+    _worker_extractor.fft_workers = 1
+    _worker_extractor.warmup()
+
+def _extract_shared(name, shape, kind, sample_rate):
+    """Worker side of FeatureProcessPool: (features, stage timings) for the audio in block `name`"""
+    # Pool workers share the parent's resource tracker, so attaching here
+    # does not take over the parent's unlink
+    shm = shared_memory.SharedMemory(name=name)
+    timings = {}
+    try:
+        if kind == 'pcm':
+            samples = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            features = _worker_extractor.extract_from_array(samples, sample_rate, timings)
+        else:
+            samples = shm.buf[:shape[0]]
+            features = _worker_extractor.extract_from_bytes(samples, timings)
+        
+        # No views may outlive the block
+        del samples
+        return features, timings
+    finally:
+        shm.close()
+
+class FeatureProcessPool:
+    """Feature extraction on worker processes, so decoding and mel computation run outside the GIL
+    
+    submit_array / submit_bytes copy the audio into a shared memory block
+    (nothing is pickled on the way in) and return a concurrent.futures.Future
+    that resolves to (features, timings): the (n_mels, max_len) features, or
+    None if extraction failed, and the worker's {stage: seconds} timings.
+    The block is released as soon as the worker is done with it.
+    """
+    
+    def __init__(self, feature_extractor, processes=None):
+        extractor_kwargs = {
+            'sample_rate': feature_extractor.sample_rate,
+            'n_mels': feature_extractor.n_mels,
+            'max_len': feature_extractor.max_len,
+            'duration': feature_extractor.duration,
+            'n_fft': feature_extractor.n_fft,
+            'hop_length': feature_extractor.hop_length
+        }
+        
+        self.sample_rate = feature_extractor.sample_rate
+        
+        # spawn: the parent runs server and inference threads, which fork does not copy safely
+        self.processes = processes or multiprocessing.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=self.processes,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_feature_worker,
+                                            initargs=(extractor_kwargs,))
+    
+    def submit_array(self, samples, sr):
+        """Extract features from a float32 (frames,) or (frames, channels) waveform"""
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+        np.ndarray(samples.shape, dtype=np.float32, buffer=shm.buf)[...] = samples
+        return self._submit(shm, samples.shape, 'pcm', sr)
+    
+    def submit_bytes(self, audio_bytes):
+        """Extract features from an encoded audio file held in memory"""
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(audio_bytes)))
+        shm.buf[:len(audio_bytes)] = audio_bytes
+        return self._submit(shm, (len(audio_bytes),), 'encoded', None)
+    
+    def _submit(self, shm, shape, kind, sample_rate):
+        try:
+            future = self.executor.submit(_extract_shared, shm.name, shape, kind, sample_rate)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        
+        def release(_):
+            shm.close()
+            shm.unlink()
+        
+        future.add_done_callback(release)
+        return future
+    
+    def warmup(self):
+        """Start every worker process now instead of on the first requests"""
+        silence = np.zeros(self.sample_rate, dtype=np.float32)
+        futures = [self.submit_array(silence, self.sample_rate) for _ in range(self.processes)]
+        for future in futures:
+            future.result()
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+# CNN Model Architecture (FIXED WITH HIGHER DROPOUT)
+class DeepfakeDetectorCNN(nn.Module):
+    """CNN model for audio deepfake detection with anti-overtraining measures"""
+    
+    def __init__(self, num_classes=2):
+        super(DeepfakeDetectorCNN, self).__init__()
+        
+        # Convolutional layers with HIGHER dropout
+        self.conv_layers = nn.Sequential(
+            # First conv block
+            nn.Conv2d(1, 32, kernel_size=3, padding=1),
+            nn.BatchNorm2d(32),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Dropout(0.4),  # INCREASED from 0.25
+            
+            # Second conv block
+            nn.Conv2d(32, 64, kernel_size=3, padding=1),
+            nn.BatchNorm2d(64),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Dropout(0.4),  # INCREASED from 0.25
+            
+            # Third conv block
+            nn.Conv2d(64, 128, kernel_size=3, padding=1),
+            nn.BatchNorm2d(128),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Dropout(0.5),  # INCREASED from 0.25
+            
+            # Fourth conv block
+            nn.Conv2d(128, 256, kernel_size=3, padding=1),
+            nn.BatchNorm2d(256),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Dropout(0.5),  # INCREASED from 0.25
+        )
+        
+        # Calculate the size of flattened features
+        # After 4 max pools (2x2), 128x128 becomes 8x8
+        self.fc_layers = nn.Sequential(
+            nn.Linear(256 * 8 * 8, 512),
+            nn.ReLU(),
+            nn.Dropout(0.6),  # INCREASED from 0.5
+            nn.Linear(512, 128),
+            nn.ReLU(),
+            nn.Dropout(0.6),  # INCREASED from 0.5
+            nn.Linear(128, num_classes)
+        )
+    
+    def forward(self, x):
+        x = self.conv_layers(x)
+        x = torch.flatten(x, 1)  # Flatten (also for channels-last / quantized conv output)
+        x = self.fc_layers(x)
+        return x
+
+def adaptive_avg_pool_time(x, bins=8):
+    """AdaptiveAvgPool over the last (time) axis, with the same bins as F.adaptive_avg_pool1d
+    
+    Built from cumsum and index_select, so traced and ONNX-exported graphs
+    keep the time axis dynamic (adaptive_avg_pool2d only exports for fixed sizes).
+    """
+    edges = torch.arange(bins + 1, device=x.device) * x.shape[-1]
+    starts = torch.div(edges[:-1], bins, rounding_mode='floor')
+    ends = -torch.div(-edges[1:], bins, rounding_mode='floor')  # ceil
+    
+    csum = F.pad(x.cumsum(-1), (1, 0))
+    return (csum.index_select(-1, ends) - csum.index_select(-1, starts)) / (ends - starts).to(x.dtype)
+
+class VariableLengthDetectorCNN(DeepfakeDetectorCNN):
+    """DeepfakeDetectorCNN for log-mel input with any number of frames (>= MIN_FRAMES)
+    
+    The conv output is averaged into the 8 time bins fc_layers expects.
+    The pool has no weights, so state dicts load in both directions, and
+    for 128-frame input every bin is one frame and outputs match
+    DeepfakeDetectorCNN (up to float rounding).
+    """
+    
+    def __init__(self, num_classes=2, time_bins=8):
+        super(VariableLengthDetectorCNN, self).__init__(num_classes)
+        self.time_bins = time_bins
+    
+    def forward(self, x):
+        x = self.conv_layers(x)
+        x = adaptive_avg_pool_time(x, self.time_bins)
+        x = torch.flatten(x, 1)
+        x = self.fc_layers(x)
+        return x
+
+def fuse_for_inference(model):
+    """Eval-only copy of a DeepfakeDetectorCNN: BatchNorm folded into each Conv2d, Dropout removed
+    
+    The folded convolutions bake in the BatchNorm running statistics, so the
+    result must not be trained further. Outputs match model.eval() up to
+    float rounding.
+    """
+    from torch.nn.utils.fusion import fuse_conv_bn_eval
+    
+    model = copy.deepcopy(model).eval()
+    for name in ('conv_layers', 'fc_layers'):
+        layers = []
+        for layer in getattr(model, name):
+            if isinstance(layer, nn.Dropout):
+                continue  # Identity at eval time
+            if isinstance(layer, nn.BatchNorm2d) and layers and isinstance(layers[-1], nn.Conv2d):
+                layers[-1] = fuse_conv_bn_eval(layers[-1], layer)
+                continue
+            layers.append(layer)
+        setattr(model, name, nn.Sequential(*layers))
+    
+    return model
+
+def freeze_for_inference(model, device=None, n_mels=128, max_len=128):
+    """Fused model traced and frozen into a TorchScript graph with weights inlined as constants"""
+    device = device or next(model.parameters()).device
+    fused = fuse_for_inference(model).to(device)
+    
+    with torch.no_grad():
+        traced = torch.jit.trace(fused, torch.zeros(1, 1, n_mels, max_len, device=device))
+    return torch.jit.freeze(traced)
+
+def load_detector_model(model_path, device, variable_length=False):
+    """Load a serving model: a float state dict (.pth) or a TorchScript file (.pt)
+    
+    Float weights are fused and frozen on load. .pt files are the frozen
+    model from convert_to_onnx.py or the int8 model from quantize_model.py;
+    quantized kernels are CPU-only, so the int8 model always comes back on
+    the CPU. variable_length=True loads float weights into
+    VariableLengthDetectorCNN. Returns (model, device) with the device
+    actually used.
+    """
+    if model_path.endswith('.pt'):
+        if variable_length:
+            # Frozen and int8 files are traced at 128 frames and cannot become variable-length
+            raise ValueError('variable_length needs float weights (.pth), not a TorchScript file')
+        model = torch.jit.load(model_path, map_location='cpu')
+        if device.type != 'cpu' and 'quantized::' not in str(model.inlined_graph):
+            model = torch.jit.load(model_path, map_location=device)
+        else:
+            device = torch.device('cpu')
+    else:
+        model = VariableLengthDetectorCNN() if variable_length else DeepfakeDetectorCNN()
+        model.load_state_dict(torch.load(model_path, map_location=device))
+        model = freeze_for_inference(model.to(device), device)
+    
+    model.eval()
+    return model, device
+
+def score_long_form(model, device, feature_extractor, samples, sr, hop_seconds=1.0,
+                    batch_size=64, threshold=0.5):
+    """Score a whole recording as overlapping windows: per-segment timeline plus overall verdict
+    
+    Each mel frame is computed once (plus the overlap between neighbouring
+    batches), and windows are built and scored batch_size at a time (one
+    forward pass for a minute of audio at the default hop), so only one
+    batch of spectra and windows is held in memory.
+    """
+    fake_probs, start_times = [], []
+    with torch.no_grad():
+        for windows, starts in feature_extractor.iter_windows(samples, sr, hop_seconds, batch_size):
+            fake_probs.append(torch.softmax(model(windows.to(device)), dim=1)[:, 1].cpu())
+            start_times.extend(starts)
+    fake_probs = torch.cat(fake_probs).numpy()
+    
+    duration = len(samples) / sr
+    window_seconds = feature_extractor.max_len * feature_extractor.hop_length / feature_extractor.sample_rate
+    segments = [{'start': float(start), 'end': float(min(start + window_seconds, duration)),
+                 'fake_probability': float(p)}
+                for start, p in zip(start_times, fake_probs)]
+    
+    fake_prob = float(fake_probs.mean())
+    return {
+        'prediction': 'FAKE' if fake_prob > threshold else 'REAL',
+        'fake_probability': fake_prob,
+        'real_probability': 1.0 - fake_prob,
+        'max_fake_probability': float(fake_probs.max()),
+        'fake_fraction': float((fake_probs > threshold).mean()),  # Share of segments judged fake
+        'duration': duration,
+        'segments': segments
+    }
+
+def warmup_model(model, device, batch_sizes=(1,), n_mels=128, max_len=128):
+    """Run dummy batches so allocator growth and oneDNN/cuDNN setup happen before serving"""
+    generator = torch.Generator().manual_seed(0)
+    with torch.no_grad():
+        for batch_size in batch_sizes:
+            model(torch.randn(batch_size, 1, n_mels, max_len, generator=generator).to(device))
+    
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
\ No newline at end of file
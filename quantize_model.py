@@ -0,0 +1,197 @@
+# quantize_model.py - int8 variant of the deepfake detector for CPU serving
+#
+# Conv blocks: static int8 (FX graph mode, calibrated on real/fake clips, conv+BN+ReLU fused)
+# fc_layers:   dynamic int8 (weights int8, activations quantized per batch)
+#
+# Outputs:
+#   models/deepfake_detector_int8.pt          TorchScript, loadable with load_detector_model()
+#   models/quantization_report.json           accuracy / size / latency parity vs the float model
+#   onnx_models/deepfake_detector_int8.onnx   (if onnx_models/deepfake_detector.onnx exists)
+
+import copy
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from detector_core import AudioFeatureExtractor, DeepfakeDetectorCNN
+
+FLOAT_MODEL_PATH = 'models/best_deepfake_detector.pth'
+INT8_MODEL_PATH = 'models/deepfake_detector_int8.pt'
+REPORT_PATH = 'models/quantization_report.json'
+FLOAT_ONNX_PATH = 'onnx_models/deepfake_detector.onnx'
+INT8_ONNX_PATH = 'onnx_models/deepfake_detector_int8.onnx'
+
+def quantized_backend():
+    """fbgemm/x86 kernels on Intel/AMD, qnnpack on ARM"""
+    engines = torch.backends.quantized.supported_engines
+    return 'x86' if 'x86' in engines else 'qnnpack'
+
+def load_labelled_features(feature_extractor, calibration_size=128, eval_size=256, seed=42):
+    """Features for a calibration split and a disjoint evaluation split of data/real + data/fake"""
+    real_files = sorted(Path('data/real').glob('*.wav'))
+    fake_files = sorted(Path('data/fake').glob('*.wav'))
+    files = [(f, 0) for f in real_files] + [(f, 1) for f in fake_files]  # 0=real, 1=fake
+    
+    if not real_files or not fake_files:
+        raise FileNotFoundError("Need audio in data/real and data/fake for calibration")
+    
+    random.Random(seed).shuffle(files)
+    files = files[:calibration_size + eval_size]
+    
+    features, labels = [], []
+    for start in range(0, len(files), 32):
+        chunk = files[start:start + 32]
+        waveforms = [(feature_extractor.load_waveform(path), label) for path, label in chunk]
+        waveforms = [(y, label) for y, label in waveforms if y is not None]
+        features.append(feature_extractor.extract_batch([y for y, _ in waveforms]))
+        labels.extend(label for _, label in waveforms)
+    
+    features = torch.cat(features)
+    labels = torch.tensor(labels)
+    
+    # Keep at least a quarter of the clips for the parity report
+    n_calibration = min(calibration_size, len(features) - max(1, len(features) // 4))
+    return (features[:n_calibration], features[n_calibration:], labels[n_calibration:])
+
+def quantize_model(model, calibration_features, backend=None):
+    """Static int8 conv blocks + dynamic int8 fc_layers; returns the converted FX GraphModule"""
+    from torch.ao.quantization import QConfigMapping, default_dynamic_qconfig, get_default_qconfig
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+    
+    backend = backend or quantized_backend()
+    torch.backends.quantized.engine = backend
+    
+    qconfig_mapping = (QConfigMapping()
+                       .set_global(get_default_qconfig(backend))
+                       .set_module_name('fc_layers', default_dynamic_qconfig))
+    
+    prepared = prepare_fx(copy.deepcopy(model).eval(), qconfig_mapping, (calibration_features[:1],))
+    
+    # Calibration: observers record activation ranges of the conv blocks
+    with torch.no_grad():
+        for batch in calibration_features.split(16):
+            prepared(batch)
+    
+    return convert_fx(prepared)
+
+def measure_latency_ms(model, features, batch_size, runs=20):
+    batch = features[:batch_size]
+    if len(batch) < batch_size:
+        batch = batch.repeat((batch_size + len(batch) - 1) // len(batch), 1, 1, 1)[:batch_size]
+    
+    with torch.no_grad():
+        for _ in range(3):
+            model(batch)
+        
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(batch)
+            times.append(time.perf_counter() - start)
+    
+    return float(np.median(times) * 1000)
+
+def parity_report(float_model, int8_model, features, labels):
+    """Compare float and int8 predictions on held-out clips"""
+    with torch.no_grad():
+        float_probs = torch.cat([torch.softmax(float_model(b), dim=1) for b in features.split(32)])
+        int8_probs = torch.cat([torch.softmax(int8_model(b), dim=1) for b in features.split(32)])
+    
+    fake_diff = (float_probs[:, 1] - int8_probs[:, 1]).abs()
+    float_pred = float_probs.argmax(dim=1)
+    int8_pred = int8_probs.argmax(dim=1)
+    
+    return {
+        'samples': len(features),
+        'prediction_agreement': (float_pred == int8_pred).float().mean().item(),
+        'float_accuracy': (float_pred == labels).float().mean().item(),
+        'int8_accuracy': (int8_pred == labels).float().mean().item(),
+        'max_abs_fake_prob_diff': fake_diff.max().item(),
+        'mean_abs_fake_prob_diff': fake_diff.mean().item(),
+        'latency_ms': {
+            name: {f'batch_{n}': measure_latency_ms(model, features, n) for n in (1, 16)}
+            for name, model in (('float', float_model), ('int8', int8_model))
+        }
+    }
+
+def quantize_onnx_model(calibration_features, onnx_path=FLOAT_ONNX_PATH, output_path=INT8_ONNX_PATH):
+    """int8 ONNX (QDQ, per-channel weights) calibrated on the same clips, for ONNX Runtime backends"""
+    try:
+        from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                              quantize_static)
+    except ImportError:
+        print("⚠️  onnxruntime not installed - skipping int8 ONNX. Install with: pip install onnxruntime")
+        return None
+    
+    if not os.path.exists(onnx_path):
+        print(f"⚠️  {onnx_path} not found - run convert_to_onnx.py first for the int8 ONNX model")
+        return None
+    
+    class FeatureReader(CalibrationDataReader):
+        def __init__(self, features):
+            self.batches = iter([{'audio_features': f.unsqueeze(0).numpy()} for f in features])
+        
+        def get_next(self):
+            return next(self.batches, None)
+    
+    quantize_static(onnx_path, output_path, FeatureReader(calibration_features),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    
+    # Newer exporters keep float weights in an external .data file next to the graph
+    float_size = sum(os.path.getsize(p) for p in (onnx_path, onnx_path + '.data') if os.path.exists(p))
+    print(f"✅ int8 ONNX model saved to {output_path} "
+          f"({os.path.getsize(output_path) / (1024 * 1024):.2f} MB, "
+          f"float {float_size / (1024 * 1024):.2f} MB)")
+    return output_path
+
+def main():
+    print("🔄 Quantizing deepfake detector to int8...")
+    
+    if not os.path.exists(FLOAT_MODEL_PATH):
+        print(f"❌ Model file not found at {FLOAT_MODEL_PATH}")
+        return None
+    
+    model = DeepfakeDetectorCNN()
+    model.load_state_dict(torch.load(FLOAT_MODEL_PATH, map_location='cpu'))
+    model.eval()
+    
+    feature_extractor = AudioFeatureExtractor()
+    calibration, eval_features, eval_labels = load_labelled_features(feature_extractor)
+    print(f"📊 Calibration clips: {len(calibration)}, parity clips: {len(eval_features)}")
+    
+    quantized = quantize_model(model, calibration)
+    
+    # TorchScript keeps the quantized graph loadable without this script
+    with torch.no_grad():
+        scripted = torch.jit.trace(quantized, calibration[:1])
+    torch.jit.save(scripted, INT8_MODEL_PATH)
+    
+    report = parity_report(model, scripted, eval_features, eval_labels)
+    report['backend'] = torch.backends.quantized.engine
+    report['float_size_mb'] = os.path.getsize(FLOAT_MODEL_PATH) / (1024 * 1024)
+    report['int8_size_mb'] = os.path.getsize(INT8_MODEL_PATH) / (1024 * 1024)
+    report['size_ratio'] = report['float_size_mb'] / report['int8_size_mb']
+    
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"✅ int8 model saved to {INT8_MODEL_PATH}")
+    print(f"📦 Size: {report['float_size_mb']:.2f} MB -> {report['int8_size_mb']:.2f} MB "
+          f"({report['size_ratio']:.1f}x smaller)")
+    print(f"🎯 Prediction agreement: {report['prediction_agreement']:.1%} "
+          f"(max fake-prob diff {report['max_abs_fake_prob_diff']:.4f})")
+    print(f"🎯 Accuracy: float {report['float_accuracy']:.1%}, int8 {report['int8_accuracy']:.1%}")
+    for name, timings in report['latency_ms'].items():
+        print(f"⚡ {name}: batch 1 {timings['batch_1']:.1f} ms, batch 16 {timings['batch_16']:.1f} ms")
+    print(f"📄 Report saved to {REPORT_PATH}")
+    
+    quantize_onnx_model(calibration)
+    return INT8_MODEL_PATH
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,111 @@
+# Server Metrics - Prometheus text-format metrics for the detection server
+# Self-contained (no prometheus_client dependency): histograms are observed
+# from request and inference threads, gauges are read when /metrics is scraped.
+
+import os
+import sys
+import threading
+
+# Seconds; covers a cache hit (~1 ms) up to a cold librosa resample
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by one label"""
+    
+    def __init__(self, name, help_text, buckets, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self.series = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+    
+    def observe(self, value, label_value=None):
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+    
+    def mean(self, label_value=None):
+        """Average observed value (0.0 before the first observation)"""
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                return 0.0
+            count = sum(series[:-1])
+            return series[-1] / count if count else 0.0
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        
+        with self.lock:
+            snapshot = {key: list(series) for key, series in self.series.items()}
+        
+        for label_value, series in sorted(snapshot.items(), key=lambda item: str(item[0])):
+            prefix = f'{self.label}="{label_value}",' if self.label else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            
+            labels = f'{{{prefix[:-1]}}}' if prefix else ''
+            lines.append(f'{self.name}_sum{labels} {series[-1]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        
+        return lines
+
+def process_rss_bytes():
+    """Current resident set size, or the peak where the current value is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class ServerMetrics:
+    """Stage latency and batch size histograms, rendered together with scrape-time values"""
+    
+    STAGES = ('decode', 'resample', 'mel', 'forward', 'total')
+    
+    def __init__(self):
+        self.stage_seconds = Histogram('deepfake_stage_seconds',
+                                       'Time spent in each detection stage',
+                                       LATENCY_BUCKETS, label='stage')
+        self.batch_size = Histogram('deepfake_inference_batch_size',
+                                    'Requests per batched forward pass', BATCH_BUCKETS)
+    
+    def observe_stages(self, timings):
+        """Record a {stage: seconds} dict from one request"""
+        for stage, seconds in timings.items():
+            self.stage_seconds.observe(seconds, stage)
+    
+    def render(self, gauges, counters):
+        """Prometheus text for the histograms plus {name: (help, value)} gauges and counters"""
+        lines = self.stage_seconds.render() + self.batch_size.render()
+        
+        for kind, metrics in (('gauge', gauges), ('counter', counters)):
+            for name, (help_text, value) in metrics.items():
+                if value is None:
+                    continue
+                lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}'])
+        
+        return '\n'.join(lines) + '\n'
\ No newline at end of file
@@ -3,7 +3,7 @@
 import torch
 import onnxruntime as ort
 import numpy as np
-from deepfake_detector import DeepfakeDetectorCNN, AudioFeatureExtractor
+from detector_core import DeepfakeDetectorCNN, AudioFeatureExtractor
 import librosa
 
 def test_onnx_vs_pytorch():